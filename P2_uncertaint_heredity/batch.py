@@ -0,0 +1,92 @@
+import multiprocessing
+import sys
+
+from enumeration import vectorized_probabilities
+from heredity import load_data
+from inference import exact_probabilities, print_probabilities
+
+ENGINES = {
+    "exact": exact_probabilities,
+    "enumeration": vectorized_probabilities,
+}
+
+
+def families(people):
+    """
+    Split `people` into independent families and return them as a list of
+    `people` dictionaries.
+
+    Two people are in the same family if one is the other's mother or
+    father, or through a chain of such links. Someone with only one parent
+    listed is treated as a founder (as in gene_and_trait_probability), so
+    that parent's link does not join them. Joint probabilities factor across
+    families, so each can be solved on its own.
+    """
+    root = {person: person for person in people}
+
+    def find(person):
+        while root[person] != person:
+            root[person] = root[root[person]]
+            person = root[person]
+        return person
+
+    for person in people:
+        mother, father = people[person]["mother"], people[person]["father"]
+        if mother is not None and father is not None:
+            for parent in (mother, father):
+                root[find(parent)] = find(person)
+
+    components = dict()
+    for person in people:
+        components.setdefault(find(person), dict())[person] = people[person]
+    return list(components.values())
+
+
+def component_probabilities(people, engine="exact", parameters=None):
+    """
+    Return the `probabilities` structure of heredity.main, solving each
+    independent family in `people` separately with `engine`.
+    """
+    probabilities = dict()
+    for family in families(people):
+        probabilities.update(ENGINES[engine](family, parameters=parameters))
+    return probabilities
+
+
+def _solve(task):
+    """Solve one family of a batch and return (path, probabilities)."""
+    path, family, engine, parameters = task
+    return path, ENGINES[engine](family, parameters=parameters)
+
+
+def batch_probabilities(paths, engine="exact", processes=None, chunksize=16, parameters=None):
+    """
+    Yield (path, probabilities) for every independent family in every CSV
+    in `paths`, as soon as each family is solved.
+
+    Files are loaded and split into families here, and the families are
+    solved by a pool of `processes` worker processes (all cores by default),
+    so results arrive in completion order rather than file order. With one
+    process everything runs in this process, in order. `parameters` is a
+    compiled Parameters, PROBS by default.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine}")
+    tasks = ((path, family, engine, parameters) for path in paths for family in families(load_data(path)))
+    if processes == 1:
+        yield from map(_solve, tasks)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(_solve, tasks, chunksize)
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python batch.py data.csv [data.csv ...]")
+    for path, probabilities in batch_probabilities(sys.argv[1:]):
+        print(f"{path}:")
+        print_probabilities(probabilities, probabilities)
+
+
+if __name__ == "__main__":
+    main()
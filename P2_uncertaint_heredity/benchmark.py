@@ -0,0 +1,218 @@
+import csv
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from compiled import compile_parameters
+from enumeration import vectorized_probabilities
+from heredity import enumerate_probabilities, load_data
+from inference import exact_probabilities
+from montecarlo import monte_carlo_probabilities
+
+# Seconds an engine may take on one family in the scaling runs
+TIME_BUDGET = 10
+
+# Family sizes tried in the scaling runs, in order, until one exceeds the budget
+SIZES = list(range(1, 16)) + [2**k for k in range(4, 18)]
+
+# Largest files each exponential engine is run on by default
+ENUMERATION_LIMIT = 7
+VECTORIZED_LIMIT = 12
+
+# Draws the Monte Carlo engines take per family
+SAMPLES = 2000
+
+
+def gibbs_probabilities(people):
+    """Return the Gibbs sampling estimates for `people`."""
+    return monte_carlo_probabilities(people, "gibbs", samples=SAMPLES, seed=0)[0]
+
+
+def weighting_probabilities(people):
+    """Return the likelihood weighting estimates for `people`."""
+    return monte_carlo_probabilities(people, "weighting", samples=SAMPLES, seed=0)[0]
+
+
+ENGINES = {
+    "enumeration": enumerate_probabilities,
+    "vectorized": vectorized_probabilities,
+    "exact": exact_probabilities,
+    "gibbs": gibbs_probabilities,
+    "weighting": weighting_probabilities,
+}
+
+# Engines that give exact answers, whose scaling is measured
+EXACT_ENGINES = ["enumeration", "vectorized", "exact"]
+
+
+def generate_pedigree(depth, founders=2, loops=0, observed=0.5, children=2, seed=0):
+    """
+    Return a synthetic family in the `load_data` format.
+
+    The first generation is `founders` unrelated people. In every later
+    generation each member of the previous one has `children` children with
+    a new spouse from outside the family, except that `loops` times in all
+    two members of the same generation have children together instead,
+    closing an inbreeding loop when they share ancestors. People are listed
+    parents first, so any prefix of the family is a family too. Genes and
+    traits are simulated from PROBS, and each trait is kept with probability
+    `observed`.
+    """
+    rng = random.Random(seed)
+    parameters = compile_parameters()
+    people, genes = dict(), dict()
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        if mother is None:
+            weights = parameters.gene
+        else:
+            weights = [parameters.inheritance[9 * g + 3 * genes[father] + genes[mother]]
+                       for g in range(3)]
+        genes[name] = rng.choices(range(3), weights)[0]
+        trait = rng.random() < parameters.has_trait[genes[name]]
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": trait if rng.random() < observed else None
+        }
+        return name
+
+    # Spread the loops over the generations after the first
+    inbred = [0] * depth
+    for g in rng.choices(range(1, depth), k=loops) if depth > 1 else []:
+        inbred[g] += 1
+
+    generation = [add() for _ in range(founders)]
+    for g in range(1, depth):
+        rng.shuffle(generation)
+        couples = []
+        while generation:
+            person = generation.pop()
+            if generation and inbred[g]:
+                inbred[g] -= 1
+                couples.append((person, generation.pop()))
+            else:
+                couples.append((person, add()))
+        generation = [add(mother, father) for mother, father in couples for _ in range(children)]
+    return people
+
+
+def write_pedigree(people, filename):
+    """Write a family out as a CSV file that `load_data` reads back."""
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = "" if person["trait"] is None else int(person["trait"])
+            writer.writerow([person["name"], person["mother"] or "", person["father"] or "", trait])
+
+
+def timed(function, *args):
+    """Return (result, seconds) for one call of `function`."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def traced(function, *args):
+    """Return the peak bytes allocated by Python during one call of `function`."""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, *args):
+    """
+    Return (result, seconds, peak bytes) for `function`. It is called twice,
+    since tracemalloc slows it down too much for the traced call to be timed.
+    """
+    result, seconds = timed(function, *args)
+    return result, seconds, traced(function, *args)
+
+
+def largest_solvable(engine, family, budget=TIME_BUDGET):
+    """
+    Run `engine` on larger and larger prefixes of `family` (sizes from
+    SIZES) in a separate process, stopping the first one that takes longer
+    than `budget` seconds. Return (people, seconds, peak bytes) for the
+    largest prefix solved in time, or None if none was.
+    """
+    best = None
+    with multiprocessing.Pool(1) as pool:
+        for size in SIZES:
+            if size > len(family):
+                break
+            people = dict(list(family.items())[:size])
+            try:
+                _, seconds = pool.apply_async(timed, (ENGINES[engine], people)).get(budget)
+            except multiprocessing.TimeoutError:
+                break
+            if seconds > budget:
+                break
+            peak = pool.apply(traced, (ENGINES[engine], people))
+            best = (size, seconds, peak)
+    return best
+
+
+def error(probabilities, reference):
+    """Return the largest absolute difference between two `probabilities` structures."""
+    return max(abs(probabilities[person][field][value] - reference[person][field][value])
+               for person in reference
+               for field in reference[person]
+               for value in reference[person][field])
+
+
+def benchmark(people, engines=None):
+    """
+    Benchmark `engines` (by default every engine practical at this size) on
+    one family. Return a list of (name, seconds, peak bytes, largest error
+    against the junction tree) rows.
+    """
+    if engines is None:
+        engines = [engine for engine in ENGINES
+                   if not (engine == "enumeration" and len(people) > ENUMERATION_LIMIT)
+                   and not (engine == "vectorized" and len(people) > VECTORIZED_LIMIT)]
+    reference = exact_probabilities(people)
+    rows = []
+    for engine in engines:
+        probabilities, seconds, peak = measure(ENGINES[engine], people)
+        rows.append((engine, seconds, peak, error(probabilities, reference)))
+    return rows
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [data.csv]")
+
+    if len(sys.argv) == 2:
+        if not os.path.isfile(sys.argv[1]):
+            sys.exit(f"{sys.argv[1]} is not a file")
+        people = load_data(sys.argv[1])
+        print(f"{sys.argv[1]}: {len(people)} people")
+        print(f"  {'engine':<14}{'seconds':>10}{'peak MB':>10}{'max error':>12}")
+        for name, seconds, peak, largest in benchmark(people):
+            print(f"  {name:<14}{seconds:>10.4f}{peak / 2**20:>10.2f}{largest:>12.2e}")
+        return
+
+    family = generate_pedigree(depth=14, founders=2, loops=8, observed=0.5)
+    print(f"Largest generated family solved within {TIME_BUDGET} seconds")
+    print(f"  {'engine':<14}{'people':>10}{'seconds':>10}{'peak MB':>10}")
+    for engine in EXACT_ENGINES:
+        best = largest_solvable(engine, family)
+        if best is None:
+            print(f"  {engine:<14}{'none':>10}")
+        else:
+            size, seconds, peak = best
+            print(f"  {engine:<14}{size:>10}{seconds:>10.4f}{peak / 2**20:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
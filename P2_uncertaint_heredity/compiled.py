@@ -0,0 +1,123 @@
+import functools
+
+from heredity import PROBS
+
+
+class Parameters():
+    """
+    The numbers behind PROBS compiled into flat conditional probability tables.
+
+        gene[g]                          P(g copies) for people without parents
+        inheritance[9 * g + 3 * f + m]   P(g copies | father has f, mother has m)
+        trait[2 * g + t]                 P(trait is t | g copies), t 0 or 1
+
+    `inheritance` is in the same order as PUNNETT[g][f][m], but derived from
+    the mutation rate: a parent with 0, 1 or 2 copies passes one on with
+    probability `mutation`, 0.5 or 1 - `mutation`, independently of the
+    other parent.
+    """
+
+    def __init__(self, gene, has_trait, mutation):
+        self.key = (tuple(gene), tuple(has_trait), mutation)
+        self.gene = list(gene)
+        self.has_trait = list(has_trait)
+        self.mutation = mutation
+        self.trait = [p for true in has_trait for p in (1 - true, true)]
+
+        passes = [mutation, 0.5, 1 - mutation]
+        self.inheritance = [0] * 27
+        for f in range(3):
+            for m in range(3):
+                father, mother = passes[f], passes[m]
+                child = [(1 - father) * (1 - mother),
+                         father * (1 - mother) + (1 - father) * mother,
+                         father * mother]
+                for g in range(3):
+                    self.inheritance[9 * g + 3 * f + m] = child[g]
+
+    def __eq__(self, other):
+        return isinstance(other, Parameters) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(key):
+    return Parameters(*key)
+
+
+def compile_parameters(probs=None):
+    """
+    Return the Parameters for a PROBS-shaped dictionary (PROBS itself by
+    default). Tables are compiled once per distinct set of numbers and
+    shared after that.
+    """
+    probs = PROBS if probs is None else probs
+    key = (tuple(probs["gene"][g] for g in range(3)),
+           tuple(probs["trait"][g][True] for g in range(3)),
+           probs["mutation"])
+    return _compile(key)
+
+
+class Pedigree():
+    """
+    A family indexed by integer ids: each person's parents (None for
+    people without both parents listed, who are treated as founders),
+    children and observed trait as 0 or 1 (None if unknown), and an order
+    with parents before children.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.mother = [None] * len(self.names)
+        self.father = [None] * len(self.names)
+        self.children = [[] for _ in self.names]
+        self.trait = [None if people[name]["trait"] is None else int(people[name]["trait"])
+                      for name in self.names]
+        for i, name in enumerate(self.names):
+            mother, father = people[name]["mother"], people[name]["father"]
+            if mother is not None and father is not None:
+                self.mother[i], self.father[i] = self.index[mother], self.index[father]
+                self.children[self.index[mother]].append(i)
+                if self.index[father] != self.index[mother]:
+                    self.children[self.index[father]].append(i)
+
+        # Parents before children
+        self.order, placed = [], set()
+        for i in range(len(self.names)):
+            stack = [i]
+            while stack:
+                j = stack[-1]
+                if j in placed:
+                    stack.pop()
+                    continue
+                waiting = [p for p in (self.mother[j], self.father[j]) if p is not None and p not in placed]
+                if waiting:
+                    stack.extend(waiting)
+                else:
+                    placed.add(j)
+                    self.order.append(j)
+                    stack.pop()
+
+    def add(self, name, person):
+        """
+        Add `name`, whose `load_data` entry is `person` and whose parents, if
+        both are listed, are already in the pedigree. Return their id.
+        """
+        i = len(self.names)
+        self.names.append(name)
+        self.index[name] = i
+        self.mother.append(None)
+        self.father.append(None)
+        self.children.append([])
+        self.trait.append(None if person["trait"] is None else int(person["trait"]))
+        mother, father = person["mother"], person["father"]
+        if mother is not None and father is not None:
+            self.mother[i], self.father[i] = self.index[mother], self.index[father]
+            self.children[self.index[mother]].append(i)
+            if self.index[father] != self.index[mother]:
+                self.children[self.index[father]].append(i)
+        self.order.append(i)
+        return i
@@ -0,0 +1,79 @@
+import sys
+
+import numpy as np
+
+from compiled import Pedigree, compile_parameters
+from heredity import load_data
+from inference import print_probabilities
+
+# Worlds evaluated per batch; bounds memory at about CHUNK x people entries
+CHUNK = 3 ** 10
+
+
+def vectorized_probabilities(people, chunk=CHUNK, parameters=None):
+    """
+    Return the same `probabilities` structure as heredity.main by exhaustive
+    enumeration, with every world handled as rows of numpy arrays instead of
+    one `joint_probability` call at a time.
+
+    Gene worlds are the base 3 digits of 0 .. 3**n - 1, one column per
+    person. Each world's joint probability is the product over people of a
+    gather into the inheritance table (indexed by the person's, father's and
+    mother's gene columns) or the gene prior for people without parents,
+    times the trait table for observed traits. An unobserved trait sums to 1
+    over its two values, so rather than enumerating it, its marginal is read
+    off as the expected chance of the trait under the gene marginal.
+    Marginals are weighted bincounts of the gene columns. `parameters` is a
+    compiled Parameters, PROBS by default.
+    """
+    parameters = parameters or compile_parameters()
+    pedigree = Pedigree(people)
+    names = pedigree.names
+    num_people = len(names)
+
+    punnett = np.array(parameters.inheritance).reshape(3, 3, 3)
+    prior = np.array(parameters.gene)
+    has_trait = np.array(parameters.has_trait)
+    trait_table = np.array(parameters.trait).reshape(3, 2)
+
+    founders = [i for i in range(num_people) if pedigree.mother[i] is None]
+    children = [i for i in range(num_people) if pedigree.mother[i] is not None]
+    mothers = [pedigree.mother[i] for i in children]
+    fathers = [pedigree.father[i] for i in children]
+    observed = [i for i in range(num_people) if pedigree.trait[i] is not None]
+    observations = np.array([pedigree.trait[i] for i in observed], dtype=np.int64)
+
+    powers = 3 ** np.arange(num_people - 1, -1, -1, dtype=np.int64)
+    gene_weights = np.zeros((num_people, 3))
+    for start in range(0, 3 ** num_people, chunk):
+        worlds = np.arange(start, min(start + chunk, 3 ** num_people), dtype=np.int64)
+        genes = (worlds[:, None] // powers) % 3
+
+        p = prior[genes[:, founders]].prod(axis=1)
+        p *= punnett[genes[:, children], genes[:, fathers], genes[:, mothers]].prod(axis=1)
+        p *= trait_table[genes[:, observed], observations].prod(axis=1)
+
+        for i in range(num_people):
+            gene_weights[i] += np.bincount(genes[:, i], weights=p, minlength=3)
+
+    probabilities = dict()
+    for i, name in enumerate(names):
+        gene = gene_weights[i] / gene_weights[i].sum()
+        trait = people[name]["trait"]
+        p_trait = float(gene @ has_trait) if trait is None else float(trait)
+        probabilities[name] = {
+            "gene": {count: float(gene[count]) for count in (2, 1, 0)},
+            "trait": {True: p_trait, False: 1 - p_trait}
+        }
+    return probabilities
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python enumeration.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, vectorized_probabilities(people))
+
+
+if __name__ == "__main__":
+    main()
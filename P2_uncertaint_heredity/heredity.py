@@ -2,7 +2,7 @@ import csv
 import itertools
 import sys
 
-debug = True
+debug = False
 
 
 PROBS = {
@@ -77,7 +77,7 @@ two_gene_punnett[0][2] = unmut * mut
 # Matrix is symmetric      
 two_gene_punnett[1][0] = two_gene_punnett[0][1]
 # .25 chance AB requring (A unmut and B unmut) and .25 chance ab requiring (a mut and b mut) and .25 chance of Ab requiring (A unmut and b mut) * 2 because aB is symmetrical
-two_gene_punnett[1][1] = .25*(unmut * unmut) + .25*(mut * mut) + 2*.5*(unmut * mut) 
+two_gene_punnett[1][1] = .25*(unmut * unmut) + .25*(mut * mut) + 2*.25*(unmut * mut) 
 # .5 chance Ab requiring (A unmut and b mut) and .5 chance AB requiring (A unmut and B unmut)
 two_gene_punnett[1][2] = .5*(unmut * mut) + .5*(unmut * unmut)
 # Matrix is symmetric 
@@ -125,14 +125,35 @@ PUNNETT = [zero_gene_punnett, one_gene_punnett, two_gene_punnett]
 def main():
 
     # Check for proper usage
-    '''
     if len(sys.argv) != 2:
         sys.exit("Usage: python heredity.py data.csv")
-    
     people = load_data(sys.argv[1])
+
+    probabilities = enumerate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+                
+        
+                
     '''
-    people = load_data("C:/Users/Kanoa/Projects/CS50/P2 Uncertainty/heredity/data/family0.csv")
-    
+    Do quick and dirty testing here
+    '''
+    #joint_probability(people, {"Harry"}, {"James"}, {"James"})            
+                
+
+def enumerate_probabilities(people):
+    """
+    Return each person's gene and trait distributions, found by summing the
+    joint probability of every combination of genes and traits consistent
+    with the known traits in `people`.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -174,24 +195,9 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
-                
-        
-                
-    '''
-    Do quick and dirty testing here
-    '''
-    #joint_probability(people, {"Harry"}, {"James"}, {"James"})            
-                
+    return probabilities
    
+
 def load_data(filename):
     """
     Load gene and trait data from a file into a dictionary.
@@ -0,0 +1,380 @@
+import heapq
+import itertools
+import sys
+
+import numpy as np
+
+from compiled import Pedigree, compile_parameters
+from heredity import load_data
+
+# Every gene variable takes one of these values
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    A table of values over the gene counts of `variables`, integer person
+    ids in a Pedigree.
+
+    Values are a numpy array with one axis of length 3 per variable, in the
+    order of `variables`. Any axes after those hold one table per parameter
+    set in a sweep; they broadcast through every product and are never
+    summed out.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = tuple(variables)
+        self.values = values
+
+    @classmethod
+    def unit(cls, variables):
+        """Return a factor of ones over `variables`."""
+        return cls(variables, np.ones((3,) * len(variables)))
+
+    def normalized(self):
+        """
+        Return the factor scaled to sum to 1. Messages are only ever needed up
+        to a constant, and rescaling keeps long pedigrees from underflowing.
+        """
+        total = self.values.sum(axis=tuple(range(len(self.variables))))
+        return Factor(self.variables, self.values / total)
+
+
+def contract(factors, keep):
+    """
+    Return the product of `factors`, summing out every variable not in
+    `keep`, as a single einsum so the full product is never stored.
+    """
+    labels = dict()
+    operands = []
+    for factor in factors:
+        operands.append(factor.values)
+        operands.append([labels.setdefault(v, len(labels)) for v in factor.variables] + [Ellipsis])
+    variables = tuple(v for v in labels if v in keep)
+    operands.append([labels[v] for v in variables] + [Ellipsis])
+    return Factor(variables, np.einsum(*operands))
+
+
+def table(entries, shape):
+    """Return a list of table entries, numbers or arrays of one length, as an array of `shape`."""
+    entries = np.broadcast_arrays(*entries)
+    return np.stack(entries).reshape(shape + entries[0].shape)
+
+
+def person_factor(pedigree, i, parameters):
+    """
+    Return the factor for person `i`'s gene: P(gene | father's and mother's
+    genes) from the inheritance table, or the gene prior for someone
+    without both parents listed, times the likelihood of their trait if it
+    has been observed. `parameters` is a compiled Parameters.
+    """
+    if pedigree.mother[i] is None:
+        variables = (i,)
+        values = table(parameters.gene, (3,))
+    else:
+        variables = (i, pedigree.father[i], pedigree.mother[i])
+        values = table(parameters.inheritance, (3, 3, 3))
+    if pedigree.trait[i] is not None:
+        likelihood = table(parameters.trait, (3, 2))[:, pedigree.trait[i]]
+        values = values * likelihood[(slice(None),) + (None,) * (len(variables) - 1)]
+    return Factor(variables, values)
+
+
+class JunctionTree():
+    """
+    Exact inference over a pedigree treated as a Bayesian network.
+
+    Each person's gene count is a variable conditioned on their mother's and
+    father's, and each observed trait is folded into its person's factor as
+    evidence. Variables are eliminated in min-fill order; the clique formed
+    when each variable is eliminated becomes a node of the junction tree, and
+    Shafer-Shenoy message passing over the tree gives every person's
+    marginal at once. For tree-like pedigrees the cliques stay at a handful
+    of people, so the cost grows linearly with family size.
+
+    Internally people are the integer ids of a compiled Pedigree; the
+    methods that take people take their names.
+    """
+
+    def __init__(self, people, parameters=None):
+        self.people = people
+        self.parameters = parameters or compile_parameters()
+        self.build()
+
+    def build(self):
+        """Eliminate variables to form the cliques, link them into a tree, and place the factors."""
+        self.pedigree = Pedigree(self.people)
+        ids = range(len(self.pedigree.names))
+        neighbors = [set() for _ in ids]
+        factors = [person_factor(self.pedigree, i, self.parameters) for i in ids]
+        for factor in factors:
+            for a, b in itertools.permutations(set(factor.variables), 2):
+                neighbors[a].add(b)
+
+        def fill_in(i):
+            around = list(neighbors[i])
+            return sum(1 for a, b in itertools.combinations(around, 2) if b not in neighbors[a])
+
+        def score(i):
+            return (fill_in(i), len(neighbors[i]), i)
+
+        # Min-fill order; eliminating a person only changes their neighbors'
+        # scores, so stale heap entries are skipped instead of rescanning everyone
+        order = []
+        self.cliques = []
+        self.home = dict()      # variable -> clique formed when it was eliminated
+        current = {i: score(i) for i in ids}
+        heap = list(current.values())
+        heapq.heapify(heap)
+        while heap:
+            entry = heapq.heappop(heap)
+            i = entry[2]
+            if current.get(i) != entry:
+                continue
+            around = neighbors[i]
+            self.home[i] = len(self.cliques)
+            self.cliques.append((i,) + tuple(sorted(around)))
+            for a, b in itertools.permutations(around, 2):
+                neighbors[a].add(b)
+            for other in around:
+                neighbors[other].discard(i)
+            del current[i]
+            order.append(i)
+            for other in around:
+                current[other] = score(other)
+                heapq.heappush(heap, current[other])
+
+        # Each clique hangs off the clique of the first of its other variables to be eliminated
+        position = {i: k for k, i in enumerate(order)}
+        self.adjacent = [[] for _ in self.cliques]
+        for k, clique in enumerate(self.cliques):
+            if len(clique) > 1:
+                parent = self.home[min(clique[1:], key=position.get)]
+                self.adjacent[k].append(parent)
+                self.adjacent[parent].append(k)
+
+        # A factor lives in the clique of the first of its variables to be eliminated
+        self.assigned = [[] for _ in self.cliques]
+        self.placed = dict()    # person -> clique holding their factor
+        for i, factor in enumerate(factors):
+            self.placed[i] = self.home[min(factor.variables, key=position.get)]
+            self.assigned[self.placed[i]].append(i)
+        self.factors = factors
+        self.potentials = [self.potential(k) for k in range(len(self.cliques))]
+        self.messages = dict()
+
+    def potential(self, i):
+        """Return the product of the factors placed in clique `i`, over all its variables."""
+        factors = [Factor.unit(self.cliques[i])] + [self.factors[person] for person in self.assigned[i]]
+        return contract(factors, self.cliques[i])
+
+    def message(self, i, j):
+        """Return the message from clique `i` to neighboring clique `j`, computing it if needed."""
+        if (i, j) not in self.messages:
+            factors = [self.potentials[i]] + [self.messages[k, i] for k in self.adjacent[i] if k != j]
+            message = contract(factors, set(self.cliques[i]) & set(self.cliques[j]))
+            self.messages[i, j] = message.normalized()
+        return self.messages[i, j]
+
+    def invalidate(self, i):
+        """Forget every message that depends on clique `i`'s potential: those flowing away from it."""
+        visited, frontier = {i}, [i]
+        while frontier:
+            j = frontier.pop()
+            for k in self.adjacent[j]:
+                if k not in visited:
+                    visited.add(k)
+                    self.messages.pop((j, k), None)
+                    frontier.append(k)
+
+    def refactor(self, person):
+        """
+        Rebuild `person`'s factor after their trait in `people` has changed.
+        Messages flowing toward their clique stay valid and are reused; the
+        rest are recomputed on demand.
+        """
+        i = self.pedigree.index[person]
+        trait = self.people[person]["trait"]
+        self.pedigree.trait[i] = None if trait is None else int(trait)
+        self.factors[i] = person_factor(self.pedigree, i, self.parameters)
+        self.potentials[self.placed[i]] = self.potential(self.placed[i])
+        self.invalidate(self.placed[i])
+
+    def add_child(self, person):
+        """
+        Add `person`, already in `people` with both parents in the tree and
+        no children of their own, as a new clique hanging off a clique that
+        holds both parents. Return False, changing nothing, if there is no
+        such clique and the tree has to be rebuilt instead.
+        """
+        index = self.pedigree.index
+        mother, father = index[self.people[person]["mother"]], index[self.people[person]["father"]]
+        parent = next((k for k, clique in enumerate(self.cliques)
+                       if mother in clique and father in clique), None)
+        if parent is None:
+            return False
+        i = self.pedigree.add(person, self.people[person])
+        k = len(self.cliques)
+        self.cliques.append((i, father, mother))
+        self.home[i] = self.placed[i] = k
+        self.adjacent.append([parent])
+        self.adjacent[parent].append(k)
+        self.assigned.append([i])
+        self.factors.append(person_factor(self.pedigree, i, self.parameters))
+        self.potentials.append(self.potential(k))
+        self.invalidate(k)
+        return True
+
+    def collect(self, root):
+        """
+        Compute every message flowing inward to clique `root` from the rest
+        of its tree, without recursion. Return the tree's cliques in
+        breadth-first order from `root` and each one's parent in that order.
+        """
+        order, parent = [root], {root: None}
+        for i in order:
+            for k in self.adjacent[i]:
+                if k not in parent:
+                    parent[k] = i
+                    order.append(k)
+        for i in reversed(order[1:]):
+            self.message(i, parent[i])
+        return order, parent
+
+    def calibrate(self):
+        """
+        Compute every message not already known: inward to a root of each
+        tree of cliques, then back outward.
+        """
+        visited = set()
+        for root in range(len(self.cliques)):
+            if root in visited:
+                continue
+            order, parent = self.collect(root)
+            visited.update(order)
+            for i in order[1:]:
+                self.message(parent[i], i)
+
+    def gene_distribution(self, person):
+        """Return the unnormalized weights of `person` having 0, 1 or 2 genes."""
+        i = self.pedigree.index[person]
+        k = self.home[i]
+        factors = [self.potentials[k]] + [self.messages[j, k] for j in self.adjacent[k]]
+        return contract(factors, {i}).values
+
+    def probabilities(self, targets=None):
+        """
+        Return the `probabilities` structure that heredity.main builds by
+        enumeration: each person's normalized gene and trait distributions.
+        With `targets`, only those people are included, and only the
+        messages into their cliques are computed.
+        """
+        if targets is None:
+            self.calibrate()
+        else:
+            for person in targets:
+                self.collect(self.home[self.pedigree.index[person]])
+        has_trait = table(self.parameters.has_trait, (3,))
+        probabilities = dict()
+        for person in targets if targets is not None else self.people:
+            weights = self.gene_distribution(person)
+            weights = weights / weights.sum(axis=0)
+            trait = self.people[person]["trait"]
+            if trait is None:
+                p = (weights * has_trait).sum(axis=0)
+            else:
+                p = 1 if trait else 0
+            if weights.ndim == 1:
+                # One parameter set: plain floats, like the other engines
+                weights, p = weights.tolist(), float(p)
+            probabilities[person] = {
+                "gene": {count: weights[count] for count in (2, 1, 0)},
+                "trait": {True: p, False: 1 - p}
+            }
+        return probabilities
+
+
+def exact_probabilities(people, parameters=None):
+    """
+    Return the same `probabilities` structure as heredity.main's enumeration,
+    computed exactly by junction tree message passing instead.
+    """
+    return JunctionTree(people, parameters).probabilities()
+
+
+def relevant_people(people, targets):
+    """
+    Return the part of `people` that can affect the marginals of `targets`.
+
+    Barren people, who are neither targets nor observed and have no such
+    descendants, sum out of the joint distribution, so only the ancestors of
+    the targets and of observed people are kept. Of those, only the ones
+    still linked to a target through mothers and fathers matter.
+    """
+    def parents(person):
+        mother, father = people[person]["mother"], people[person]["father"]
+        return [] if mother is None or father is None else [mother, father]
+
+    ancestral = set()
+    frontier = list(targets) + [person for person in people if people[person]["trait"] is not None]
+    while frontier:
+        person = frontier.pop()
+        if person not in ancestral:
+            ancestral.add(person)
+            frontier.extend(parents(person))
+
+    neighbors = {person: set() for person in ancestral}
+    for person in ancestral:
+        for parent in parents(person):
+            neighbors[person].add(parent)
+            neighbors[parent].add(person)
+    linked, frontier = set(targets), list(targets)
+    while frontier:
+        for other in neighbors[frontier.pop()]:
+            if other not in linked:
+                linked.add(other)
+                frontier.append(other)
+    return {person: people[person] for person in people if person in linked}
+
+
+def query(people, targets, evidence=None, parameters=None):
+    """
+    Return the `probabilities` structure for just the people in `targets`.
+
+    `evidence` maps people to an observed trait (True or False), or to None
+    to ignore a trait given in `people`. Inference only runs over the people
+    relevant to the targets, so its cost depends on that part of the family
+    rather than on the whole file.
+    """
+    if evidence:
+        people = {person: dict(people[person], trait=evidence[person]) if person in evidence
+                  else people[person] for person in people}
+    return JunctionTree(relevant_people(people, targets), parameters).probabilities(targets)
+
+
+def print_probabilities(people, probabilities):
+    """Print probabilities in the format heredity.main uses."""
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python inference.py data.csv [person ...]")
+    people = load_data(sys.argv[1])
+    if len(sys.argv) > 2:
+        targets = sys.argv[2:]
+        if any(person not in people for person in targets):
+            sys.exit("Every person queried must be in data.csv")
+        print_probabilities(targets, query(people, targets))
+    else:
+        print_probabilities(people, exact_probabilities(people))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import numpy as np
+
+from compiled import Pedigree, compile_parameters
+from heredity import load_data
+
+METHODS = ["gibbs", "weighting"]
+
+# Default budget when neither a sample count nor a time limit is given
+SAMPLES = 10000
+
+# Gibbs sweeps discarded before estimates are collected
+BURN_IN = 100
+
+# Samples per batch; standard errors come from the spread of batch estimates
+GIBBS_BATCH = 50
+WEIGHTING_BATCH = 1000
+
+# Consecutive batches are pooled into at most this many groups before the
+# spread is measured, so slowly mixing chains do not look too certain
+ERROR_GROUPS = 30
+
+
+def local_weight(parameters, pedigree, genes, i, gene):
+    """
+    Return the probability of person `i` having `gene` copies given their
+    parents' genes, times the likelihood of their observed trait, if any.
+    """
+    mother, father = pedigree.mother[i], pedigree.father[i]
+    if mother is None:
+        p = parameters.gene[gene]
+    else:
+        p = parameters.inheritance[9 * gene + 3 * genes[father] + genes[mother]]
+    if pedigree.trait[i] is not None:
+        p *= parameters.trait[2 * gene + pedigree.trait[i]]
+    return p
+
+
+def gibbs_batches(parameters, pedigree, rng, samples, deadline):
+    """
+    Yield (log scale, weight, squared weight, gene sums, gene squares)
+    batches from one Gibbs chain.
+
+    Each step redraws one person's gene count from its distribution given
+    their Markov blanket: their parents, their children and their children's
+    other parents. Every observed trait stays fixed at its observed value.
+    Batches hold the sum of those conditional distributions over GIBBS_BATCH
+    sweeps (a Rao-Blackwellized estimate) and the sum of their squares, and
+    every sweep has weight 1.
+    """
+    n = len(pedigree.names)
+    genes = [0] * n
+    for i in pedigree.order:
+        weights = [local_weight(parameters, pedigree, genes, i, gene) for gene in range(3)]
+        genes[i] = rng.choices(range(3), weights)[0]
+
+    def sweep(sums, squares):
+        for i in range(n):
+            weights = []
+            for gene in range(3):
+                genes[i] = gene
+                p = local_weight(parameters, pedigree, genes, i, gene)
+                for child in pedigree.children[i]:
+                    p *= local_weight(parameters, pedigree, genes, child, genes[child])
+                weights.append(p)
+            total = sum(weights)
+            if sums is not None:
+                for gene in range(3):
+                    sums[i, gene] += weights[gene] / total
+                    squares[i, gene] += (weights[gene] / total) ** 2
+            genes[i] = rng.choices(range(3), weights)[0]
+
+    for _ in range(BURN_IN):
+        sweep(None, None)
+    drawn = 0
+    while drawn < samples and time.perf_counter() < deadline:
+        size = min(GIBBS_BATCH, samples - drawn)
+        sums, squares = np.zeros((n, 3)), np.zeros((n, 3))
+        for _ in range(size):
+            sweep(sums, squares)
+        drawn += size
+        yield 0.0, float(size), float(size), sums, squares
+
+
+def weighting_batches(parameters, pedigree, rng, samples, deadline):
+    """
+    Yield (log scale, weight, squared weight, gene sums, gene squares)
+    batches of likelihood weighting, where gene squares sum the squared
+    weights of the draws with each gene count.
+
+    Gene counts are drawn parents-first from the gene prior and inheritance
+    table, and each draw is weighted by the likelihood of the observed
+    traits. Weights are kept relative to the largest in the batch, whose log
+    is the batch scale, so large families do not underflow. Few draws agree
+    with many observed traits at once, so on heavily observed families the
+    weight piles onto a handful of draws and Gibbs sampling is the better
+    choice.
+    """
+    n = len(pedigree.names)
+    prior = np.cumsum(parameters.gene)
+    punnett = np.cumsum(np.array(parameters.inheritance).reshape(3, 3, 3).transpose(1, 2, 0),
+                        axis=2)    # [father, mother, child]
+    log_trait = np.log(parameters.trait).reshape(3, 2)
+    observed = [i for i in range(n) if pedigree.trait[i] is not None]
+
+    drawn = 0
+    while drawn < samples and time.perf_counter() < deadline:
+        size = min(WEIGHTING_BATCH, samples - drawn)
+        genes = np.zeros((size, n), dtype=np.int64)
+        u = rng.random((size, n))
+        for i in pedigree.order:
+            if pedigree.mother[i] is None:
+                cdf = prior[None, :]
+            else:
+                cdf = punnett[genes[:, pedigree.father[i]], genes[:, pedigree.mother[i]]]
+            genes[:, i] = (u[:, i, None] > cdf[:, :2]).sum(axis=1)
+
+        log_weights = np.zeros(size)
+        for i in observed:
+            log_weights += log_trait[genes[:, i], pedigree.trait[i]]
+        scale = log_weights.max()
+        weights = np.exp(log_weights - scale)
+
+        sums, squares = np.zeros((n, 3)), np.zeros((n, 3))
+        for i in range(n):
+            sums[i] = np.bincount(genes[:, i], weights=weights, minlength=3)
+            squares[i] = np.bincount(genes[:, i], weights=weights ** 2, minlength=3)
+        drawn += size
+        yield float(scale), float(weights.sum()), float((weights ** 2).sum()), sums, squares
+
+
+def run_chain(people, method, samples, seconds, seed, parameters=None):
+    """Run one chain of `method` within its budget and return its list of batches."""
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method}")
+    parameters = parameters or compile_parameters()
+    pedigree = Pedigree(people)
+    deadline = time.perf_counter() + seconds if seconds is not None else math.inf
+    if method == "gibbs":
+        batches = gibbs_batches(parameters, pedigree, random.Random(seed), samples, deadline)
+    else:
+        batches = weighting_batches(parameters, pedigree, np.random.default_rng(seed), samples, deadline)
+    return list(batches)
+
+
+def estimate(people, batches, parameters=None, method="gibbs"):
+    """
+    Return (probabilities, errors) from a list of batches of `method`: the
+    ratio of summed gene weights to summed batch weights, and its standard
+    error. Both are in the `probabilities` structure of heredity.main.
+
+    Likelihood weighting draws are independent, so the error is the
+    self-normalized importance sampling one, sum w^2 (f - p)^2 / (sum w)^2,
+    over effective sample size (sum w)^2 / sum w^2. Gibbs sweeps are not,
+    so the error comes from the spread of the estimates of up to
+    ERROR_GROUPS groups of consecutive batches, and the effective sample
+    size is the sweeps over the autocorrelation time that spread implies.
+
+    A probability well below 1 / (effective sample size) is rarely drawn at
+    all, so the draws alone make it look more certain than it is; that
+    resolution, 1 / (effective sample size), is added to every error in
+    quadrature.
+    """
+    offset = max(batch[0] for batch in batches)
+    scales = np.array([math.exp(batch[0] - offset) for batch in batches])
+    weights = scales * np.array([batch[1] for batch in batches])
+    weight_squares = (scales ** 2 * np.array([batch[2] for batch in batches])).sum()
+    sums = scales[:, None, None] * np.array([batch[3] for batch in batches])
+    squares = (scales[:, None, None] ** 2 * np.array([batch[4] for batch in batches])).sum(axis=0)
+    has_trait = np.array((parameters or compile_parameters()).has_trait)
+
+    total = weights.sum()
+    genes = sums.sum(axis=0) / total
+    traits = genes @ has_trait
+    if method == "weighting":
+        # Each draw's gene is an indicator, so its squared weight is counted
+        # once in `squares` for the gene drawn
+        gene_variance = (squares * (1 - 2 * genes) + genes ** 2 * weight_squares) / total ** 2
+        trait_variance = (squares @ has_trait ** 2 - 2 * traits * (squares @ has_trait)
+                          + traits ** 2 * weight_squares) / total ** 2
+        size = total ** 2 / weight_squares
+    elif len(batches) > 1:
+        groups = np.arange(len(batches)) * min(len(batches), ERROR_GROUPS) // len(batches)
+        weights = np.bincount(groups, weights=weights)
+        sums = np.stack([sums[groups == group].sum(axis=0) for group in range(len(weights))])
+        correction = len(weights) / (len(weights) - 1)
+        gene_variance = ((sums - weights[:, None, None] * genes) ** 2).sum(axis=0) * correction / total ** 2
+        trait_variance = (((sums @ has_trait) - weights[:, None] * traits) ** 2).sum(axis=0) * correction / total ** 2
+
+        # Sweeps per independent draw: batch means spread against single sweeps
+        spread = (squares / total - genes ** 2).sum()
+        size = min(total, spread / gene_variance.sum()) if gene_variance.sum() > 0 else total
+    else:
+        gene_variance = np.full(genes.shape, math.inf)
+        trait_variance = np.full(traits.shape, math.inf)
+        size = total
+    gene_errors = np.sqrt(gene_variance + 1 / size ** 2)
+    trait_errors = np.sqrt(trait_variance + 1 / size ** 2)
+
+    probabilities, errors = dict(), dict()
+    for i, person in enumerate(people):
+        trait = people[person]["trait"]
+        p_trait = float(traits[i]) if trait is None else float(trait)
+        trait_error = float(trait_errors[i]) if trait is None else 0.0
+        probabilities[person] = {
+            "gene": {count: float(genes[i, count]) for count in (2, 1, 0)},
+            "trait": {True: p_trait, False: 1 - p_trait}
+        }
+        errors[person] = {
+            "gene": {count: float(gene_errors[i, count]) for count in (2, 1, 0)},
+            "trait": {True: trait_error, False: trait_error}
+        }
+    return probabilities, errors
+
+
+def monte_carlo_probabilities(people, method="gibbs", samples=None, seconds=None, seed=None,
+                              processes=1, parameters=None):
+    """
+    Return (probabilities, errors) for a family too large to enumerate:
+    approximate marginals in the `probabilities` structure of heredity.main,
+    and the standard error of each.
+
+    `method` is "gibbs" or "weighting" (likelihood weighting). Sampling
+    stops after `samples` draws (Gibbs sweeps) or `seconds`, whichever
+    comes first, and returns whatever has been collected by then; with
+    neither given it draws SAMPLES. With `processes` above 1, that many
+    independent chains run in parallel, each with the full time budget and
+    an equal share of the samples, and their batches are pooled.
+    `parameters` is a compiled Parameters, PROBS by default.
+    """
+    if samples is None:
+        samples = SAMPLES if seconds is None else math.inf
+    if processes > 1:
+        shares = [samples if samples == math.inf else math.ceil(samples / processes)] * processes
+        seeds = [None if seed is None else seed + k for k in range(processes)]
+        with multiprocessing.Pool(processes) as pool:
+            chains = pool.starmap(run_chain, [(people, method, shares[k], seconds, seeds[k], parameters)
+                                              for k in range(processes)])
+        batches = [batch for chain in chains for batch in chain]
+    else:
+        batches = run_chain(people, method, samples, seconds, seed, parameters)
+    if not batches:
+        raise ValueError("the budget ran out before any samples were drawn")
+    return estimate(people, batches, parameters, method)
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python montecarlo.py data.csv [gibbs|weighting] [seconds]")
+    method = sys.argv[2] if len(sys.argv) >= 3 else "gibbs"
+    if method not in METHODS:
+        sys.exit(f"Method must be one of {', '.join(METHODS)}")
+    seconds = float(sys.argv[3]) if len(sys.argv) == 4 else None
+    people = load_data(sys.argv[1])
+    probabilities, errors = monte_carlo_probabilities(people, method, seconds=seconds)
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from batch import families
+from heredity import load_data
+from inference import JunctionTree
+
+
+class InferenceSession():
+    """
+    A pedigree kept in memory between changes to its evidence.
+
+    Each independent family has its own junction tree, and every message
+    computed is cached. Changing one person's trait only rebuilds that
+    person's factor and forgets the messages flowing away from it, so the
+    next query recomputes just those; other families are not touched. A new
+    child of two people already in a clique together is attached to the
+    existing tree, and any other new person rebuilds only the families they
+    join.
+    """
+
+    def __init__(self, people, parameters=None):
+        self.parameters = parameters
+        self.people = dict()
+        self.trees = dict()     # person -> junction tree of their family
+        for family in families(people):
+            self.people.update(family)
+            self.plant(family)
+
+    @classmethod
+    def load(cls, filename, parameters=None):
+        """Return a session over the people in a CSV file read by `load_data`."""
+        return cls(load_data(filename), parameters)
+
+    def plant(self, family):
+        """Build a junction tree for `family` and point each of its people at it."""
+        tree = JunctionTree(family, self.parameters)
+        for person in family:
+            self.trees[person] = tree
+
+    def set_evidence(self, person, trait):
+        """Record that `person` does (True) or does not (False) have the trait, or None for unknown."""
+        if person not in self.people:
+            raise KeyError(person)
+        self.people[person] = dict(self.people[person], trait=trait)
+        tree = self.trees[person]
+        tree.people[person] = self.people[person]
+        tree.refactor(person)
+
+    def clear_evidence(self, person):
+        """Forget any trait observation for `person`."""
+        self.set_evidence(person, None)
+
+    def add_person(self, name, mother=None, father=None, trait=None):
+        """
+        Add a person to the pedigree. Parents must already be in it, and,
+        as in `load_data`, a person needs both parents listed to be
+        treated as their child.
+        """
+        if name in self.people:
+            raise ValueError(f"{name} is already in the pedigree")
+        for parent in (mother, father):
+            if parent is not None and parent not in self.people:
+                raise KeyError(parent)
+        self.people[name] = {"name": name, "mother": mother, "father": father, "trait": trait}
+
+        if mother is None or father is None:
+            self.plant({name: self.people[name]})
+            return
+        tree = self.trees[mother]
+        if tree is self.trees[father]:
+            tree.people[name] = self.people[name]
+            if tree.add_child(name):
+                self.trees[name] = tree
+                return
+            del tree.people[name]
+
+        # Rebuild the parents' families as one, with the new person in it
+        family = dict()
+        for parent in (mother, father):
+            family.update(self.trees[parent].people)
+        family[name] = self.people[name]
+        self.plant(family)
+
+    def probabilities(self, targets=None):
+        """
+        Return the `probabilities` structure of heredity.main for `targets`,
+        or for everyone, reusing every message still valid.
+        """
+        targets = list(self.people) if targets is None else list(targets)
+        groups = dict()
+        for person in targets:
+            groups.setdefault(id(self.trees[person]), (self.trees[person], []))[1].append(person)
+        probabilities = dict()
+        for tree, people in groups.values():
+            probabilities.update(tree.probabilities(people))
+        return {person: probabilities[person] for person in targets}
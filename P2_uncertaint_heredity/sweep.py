@@ -0,0 +1,84 @@
+import copy
+import sys
+
+import numpy as np
+
+from compiled import Parameters
+from heredity import PROBS, load_data
+from inference import JunctionTree
+
+# Mutation rates tried by the command line sweep
+MUTATION_RATES = np.linspace(0, 0.1, 11)
+
+
+def stack_parameters(probs_list):
+    """
+    Return one Parameters whose table entries are numpy arrays with one
+    element per PROBS-shaped dictionary in `probs_list`, so that arithmetic
+    on the tables works on every parameter set at once.
+    """
+    gene = [np.array([probs["gene"][g] for probs in probs_list], dtype=float) for g in range(3)]
+    has_trait = [np.array([probs["trait"][g][True] for probs in probs_list], dtype=float)
+                 for g in range(3)]
+    mutation = np.array([probs["mutation"] for probs in probs_list], dtype=float)
+    return Parameters(gene, has_trait, mutation)
+
+
+def sweep_probabilities(people, probs_list, targets=None):
+    """
+    Return a list with the `probabilities` structure of heredity.main for
+    each PROBS-shaped dictionary in `probs_list`.
+
+    The junction tree is built once, and every factor and message holds an
+    array along the parameter axis in place of each number, so the whole
+    sweep costs one pass of message passing over arrays rather than one
+    inference per parameter set.
+    """
+    if not probs_list:
+        return []
+    stacked = JunctionTree(people, stack_parameters(probs_list)).probabilities(targets)
+    columns = {
+        person: {
+            field: {value: np.broadcast_to(p, len(probs_list)).tolist()
+                    for value, p in distribution.items()}
+            for field, distribution in stacked[person].items()
+        }
+        for person in stacked
+    }
+    results = []
+    for k in range(len(probs_list)):
+        results.append({
+            person: {
+                field: {value: column[k] for value, column in distribution.items()}
+                for field, distribution in columns[person].items()
+            }
+            for person in columns
+        })
+    return results
+
+
+def mutation_grid(rates, probs=None):
+    """Return copies of `probs` (PROBS by default) with each mutation rate in `rates`."""
+    grid = []
+    for rate in rates:
+        grid.append(copy.deepcopy(PROBS if probs is None else probs))
+        grid[-1]["mutation"] = float(rate)
+    return grid
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python sweep.py data.csv person")
+    people = load_data(sys.argv[1])
+    person = sys.argv[2]
+    if person not in people:
+        sys.exit(f"{person} is not in {sys.argv[1]}")
+    results = sweep_probabilities(people, mutation_grid(MUTATION_RATES), [person])
+    print(f"{'mutation':>10}{'2':>8}{'1':>8}{'0':>8}{'trait':>8}")
+    for rate, probabilities in zip(MUTATION_RATES, results):
+        gene, trait = probabilities[person]["gene"], probabilities[person]["trait"]
+        print(f"{rate:>10.3f}{gene[2]:>8.4f}{gene[1]:>8.4f}{gene[0]:>8.4f}{trait[True]:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
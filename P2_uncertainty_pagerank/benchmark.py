@@ -0,0 +1,158 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+from linkgraph import LinkGraph, as_graph, scan_corpus
+from sampling import batched_sample_pagerank, compiled_sample_pagerank
+from solvers import SOLVERS, power_iteration, solve_pagerank
+
+DAMPING = pagerank.DAMPING
+SAMPLES = pagerank.SAMPLES
+
+SIZES = [10**2, 10**3, 10**4, 10**5, 10**6]
+
+# Largest corpora each kind of run is attempted on; the dictionary based
+# reference functions are O(N^2) per sweep or O(N) per sample
+HTML_LIMIT = 10**5
+ITERATE_LIMIT = 10**3
+SAMPLE_LIMIT = 10**3
+
+
+def generate_graph(num_pages, mean_links=8, exponent=2.1, dangling=0.1, disconnected=0.02,
+                   seed=0):
+    """
+    Return a synthetic LinkGraph with a power-law link structure.
+
+    Out-degrees follow a Zipf distribution with the given `exponent`, scaled
+    to about `mean_links` links per page, and link targets are drawn with
+    power-law popularity so a few pages collect most inbound links. A
+    `dangling` fraction of pages has no links of its own, and a
+    `disconnected` fraction has no links in or out.
+    """
+    rng = np.random.default_rng(seed)
+    pages = [f"page{i}.html" for i in range(num_pages)]
+    roles = rng.permutation(num_pages)
+    num_isolated = int(disconnected * num_pages)
+    num_dangling = int(dangling * num_pages)
+    isolated = roles[:num_isolated]
+    linking = roles[num_isolated + num_dangling:]
+
+    degree = np.zeros(num_pages, dtype=np.int64)
+    raw = np.minimum(rng.zipf(exponent, size=len(linking)), num_pages)
+    degree[linking] = np.maximum(1, np.round(raw * mean_links / max(raw.mean(), 1)))
+
+    # Popularity falls off as a power of a random ranking of the reachable pages
+    candidates = np.setdiff1d(np.arange(num_pages), isolated)
+    popularity = 1 / (1 + rng.permutation(len(candidates))) ** 0.9
+    popularity /= popularity.sum()
+
+    sources = np.repeat(np.arange(num_pages), degree)
+    targets = candidates[rng.choice(len(candidates), size=len(sources), p=popularity)]
+
+    # Drop self links and duplicates, then lay the edges out as CSR
+    keep = sources != targets
+    edges = np.unique(np.column_stack([sources[keep], targets[keep]]), axis=0)
+    out_ptr = np.zeros(num_pages + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges[:, 0], minlength=num_pages), out=out_ptr[1:])
+    return LinkGraph(pages, out_ptr, edges[:, 1])
+
+
+def generate_corpus(num_pages, **options):
+    """Return a synthetic corpus as a `crawl()` style dictionary."""
+    return generate_graph(num_pages, **options).to_corpus()
+
+
+def write_corpus(graph, directory):
+    """Write a LinkGraph out as a directory of HTML pages like the ones in data/, with any pending edits applied."""
+    graph = as_graph(graph)
+    os.makedirs(directory, exist_ok=True)
+    for i, page in enumerate(graph.pages):
+        items = "".join(f'            <li><a href="{graph.pages[j]}">{graph.pages[j]}</a></li>\n'
+                        for j in graph.links(i))
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html lang=\"en\">\n    <head>\n        <title>{page}</title>\n"
+                    f"    </head>\n    <body>\n        <ul>\n{items}        </ul>\n    </body>\n</html>\n")
+
+
+def measure(function, *args, **kwargs):
+    """
+    Return (result, seconds, peak bytes) for one call. The call is timed on
+    its own and then repeated under tracemalloc, which slows Python code
+    down too much to time at the same time.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def error(ranks, graph, reference):
+    """Return the L1 distance between a page -> rank dictionary and the reference vector."""
+    return sum(abs(ranks.get(page, 0) - reference[i]) for i, page in enumerate(graph.pages))
+
+
+def benchmark(num_pages, seed=0):
+    """
+    Benchmark every crawler and engine that is practical at `num_pages` pages.
+    Return a list of (name, seconds, peak bytes, L1 error) rows; crawlers
+    have no error.
+    """
+    graph = generate_graph(num_pages, seed=seed)
+    reference = power_iteration(graph, DAMPING, tolerance=1e-12)
+    rows = []
+
+    if num_pages <= HTML_LIMIT:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(graph, directory)
+            for name, crawler in [("crawl", pagerank.crawl), ("scan_corpus", scan_corpus)]:
+                _, seconds, peak = measure(crawler, directory)
+                rows.append((name, seconds, peak, None))
+
+    if num_pages <= max(SAMPLE_LIMIT, ITERATE_LIMIT):
+        corpus = graph.to_corpus()
+        if num_pages <= SAMPLE_LIMIT:
+            ranks, seconds, peak = measure(pagerank.sample_pagerank, corpus, DAMPING, SAMPLES)
+            rows.append(("sample_pagerank", seconds, peak, error(ranks, graph, reference)))
+        if num_pages <= ITERATE_LIMIT:
+            # iterate_pagerank rewrites pages without links, so give it its own copy
+            ranks, seconds, peak = measure(lambda: pagerank.iterate_pagerank(
+                {page: set(links) for page, links in corpus.items()}, DAMPING))
+            rows.append(("iterate_pagerank", seconds, peak, error(ranks, graph, reference)))
+
+    ranks, seconds, peak = measure(compiled_sample_pagerank, graph, DAMPING, SAMPLES, seed=seed)
+    rows.append(("compiled", seconds, peak, error(ranks, graph, reference)))
+    (ranks, _), seconds, peak = measure(batched_sample_pagerank, graph, DAMPING, seed=seed)
+    rows.append(("walkers", seconds, peak, error(ranks, graph, reference)))
+    for solver in SOLVERS:
+        (ranks, _), seconds, peak = measure(solve_pagerank, graph, DAMPING, solver)
+        rows.append((solver, seconds, peak, error(ranks, graph, reference)))
+    return rows
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [max_pages]")
+    max_pages = int(sys.argv[1]) if len(sys.argv) == 2 else 10**4
+
+    for num_pages in SIZES:
+        if num_pages > max_pages:
+            break
+        print(f"{num_pages} pages")
+        print(f"  {'engine':<18}{'seconds':>10}{'peak MB':>10}{'L1 error':>12}")
+        for name, seconds, peak, l1 in benchmark(num_pages):
+            l1 = "" if l1 is None else f"{l1:.2e}"
+            print(f"  {name:<18}{seconds:>10.4f}{peak / 2**20:>10.2f}{l1:>12}")
+
+
+if __name__ == "__main__":
+    main()
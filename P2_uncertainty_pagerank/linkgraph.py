@@ -0,0 +1,477 @@
+import mmap
+import os
+import re
+from array import array
+from multiprocessing import Pool
+
+import numpy as np
+
+LINK_PATTERN = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 256
+
+# Files at least this large are memory mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+
+class LinkGraph():
+    """
+    Integer-indexed link graph compiled from a corpus dictionary.
+
+    Pages are numbered 0..N-1 in `pages` order. Outbound links are stored in
+    CSR form: the links of page i are `out_links[out_ptr[i]:out_ptr[i + 1]]`.
+    The inbound (transposed) CSR arrays are built on first use.
+
+    Changes recorded by `edit` are kept as an overlay on the CSR arrays until
+    `merge` folds them in: a replacement link array for each edited page and
+    a set of removed page ids, which keep their slot in `pages` until then.
+    The CSR arrays, degrees and inbound arrays describe the graph as of the
+    last merge.
+    """
+
+    def __init__(self, pages, out_ptr, out_links):
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.set_edges(out_ptr, out_links)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Compile a `crawl()` style dictionary (page -> set of linked pages).
+        Links to pages outside the corpus are ignored. The corpus is not modified.
+        """
+        pages = list(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        out_ptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        out_links = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page] if link in index)
+            out_links.extend(links)
+            out_ptr[i + 1] = len(out_links)
+        return cls(pages, out_ptr, out_links)
+
+    @property
+    def num_pages(self):
+        return len(self.pages)
+
+    @property
+    def num_edges(self):
+        return len(self.out_links)
+
+    def links(self, i):
+        """Return the array of page ids linked to by page id `i`, pending edits included."""
+        if i in self.replaced:
+            return self.replaced[i]
+        return self.out_links[self.out_ptr[i]:self.out_ptr[i + 1]]
+
+    @property
+    def inbound(self):
+        """
+        Return (in_ptr, in_links, in_targets): inbound CSR arrays where the pages
+        linking to page i are `in_links[in_ptr[i]:in_ptr[i + 1]]`, and
+        `in_targets` repeats i once per inbound edge (the CSR row of each edge).
+        """
+        if self._inbound is None:
+            num_pages = len(self.out_degree)
+            sources = np.repeat(np.arange(num_pages, dtype=np.int32), self.out_degree)
+            order = np.argsort(self.out_links, kind="stable")
+            in_links = sources[order]
+            in_targets = self.out_links[order]
+            in_ptr = np.zeros(num_pages + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.out_links, minlength=num_pages), out=in_ptr[1:])
+            self._inbound = (in_ptr, in_links, in_targets)
+        return self._inbound
+
+    def linking(self, i):
+        """Return the ids of the pages currently linking to page id `i`."""
+        sources = []
+        if i < len(self.out_ptr) - 1:
+            in_ptr, in_links, _ = self.inbound
+            sources = [j for j in in_links[in_ptr[i]:in_ptr[i + 1]].tolist() if j not in self.replaced]
+        sources.extend(j for j, targets in self.replaced.items() if (targets == i).any())
+        return sources
+
+    def to_corpus(self):
+        """Return the graph as a page -> set of linked pages dictionary."""
+        return {
+            page: set(self.pages[j] for j in self.links(i))
+            for i, page in enumerate(self.pages) if i not in self.removed
+        }
+
+    def to_ranks(self, vector):
+        """Map a rank vector indexed by page id back to a page -> rank dictionary."""
+        return {page: float(vector[i]) for i, page in enumerate(self.pages) if i not in self.removed}
+
+    def set_edges(self, out_ptr, out_links):
+        """Replace the CSR arrays in place, dropping the cached inbound arrays and any pending edits."""
+        self.out_ptr = np.asarray(out_ptr, dtype=np.int64)
+        self.out_links = np.asarray(out_links, dtype=np.int32)
+        self.out_degree = np.diff(self.out_ptr)
+        self.dangling = self.out_degree == 0
+        self._inbound = None
+        self.replaced = dict()
+        self.removed = set()
+
+    def edit(self, links=None, removed=()):
+        """
+        Record a change to the graph without rebuilding its CSR arrays.
+
+        `links` maps page names to the set of pages they now link to; pages not
+        yet in the graph are added at the end. Pages in `removed` are deleted
+        along with every link to them. Page ids do not change: each edited
+        page gets a replacement link array and each removed page a marker,
+        which `links`, `linking`, `to_corpus` and `to_ranks` take into
+        account, while the CSR arrays stay as they were until `merge`. The
+        work is proportional to the pages changed and the links into removed
+        pages, not to the size of the graph.
+        """
+        links = links or dict()
+        removed = set(page for page in removed if page in self.index)
+        dropped = np.array([self.index[page] for page in removed], dtype=np.int32)
+
+        # Pages that lose a link because its target is removed
+        losing = set()
+        for i in dropped.tolist():
+            losing.update(self.linking(i))
+        for i in dropped.tolist():
+            del self.index[self.pages[i]]
+            self.removed.add(i)
+            self.replaced[i] = np.zeros(0, dtype=np.int32)
+        for i in losing.difference(self.removed):
+            targets = self.links(i)
+            self.replaced[i] = targets[~np.isin(targets, dropped)]
+
+        for page in links:
+            if page not in self.index and page not in removed:
+                self.index[page] = len(self.pages)
+                self.pages.append(page)
+        for page, targets in links.items():
+            if page in removed:
+                continue
+            ids = sorted(set(self.index[link] for link in targets if link in self.index))
+            self.replaced[self.index[page]] = np.array(ids, dtype=np.int32)
+
+    def pending_links(self):
+        """Return the number of links held in edits not yet merged into the CSR arrays."""
+        return sum(len(targets) for targets in self.replaced.values())
+
+    def _merged_edges(self):
+        """
+        Return (pages, out_ptr, out_links, remap) for the graph with its pending
+        edits applied, where remap maps each current page id to its new id, or
+        -1 if removed. Links of unedited pages are carried over as arrays with
+        no per-edge Python work.
+        """
+        num_base = len(self.out_ptr) - 1
+        keep = np.ones(self.num_pages, dtype=bool)
+        keep[list(self.removed)] = False
+        pages = [page for page, kept in zip(self.pages, keep) if kept]
+        remap = np.full(self.num_pages, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(pages))
+
+        rewritten = np.zeros(num_base, dtype=bool)
+        rewritten[[i for i in self.replaced if i < num_base]] = True
+        sources = np.repeat(np.arange(num_base), self.out_degree)
+        carried = ~rewritten[sources]
+        rows = [remap[sources[carried]]]
+        columns = [remap[self.out_links[carried]]]
+        for i, targets in self.replaced.items():
+            if keep[i]:
+                rows.append(np.full(len(targets), remap[i], dtype=np.int64))
+                columns.append(remap[targets])
+
+        rows = np.concatenate(rows)
+        columns = np.concatenate(columns)
+        order = np.lexsort((columns, rows))
+        out_ptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(pages)), out=out_ptr[1:])
+        return pages, out_ptr, columns[order], remap
+
+    def merge(self):
+        """
+        Fold the pending edits into the CSR arrays, renumbering the pages so
+        that removed ones leave no gaps. The remaining pages keep their
+        relative order. Return an array mapping each old page id to its new
+        id, or -1 if removed.
+        """
+        pages, out_ptr, out_links, remap = self._merged_edges()
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+        self.set_edges(out_ptr, out_links)
+        return remap
+
+    def merged(self):
+        """Return a new LinkGraph with the pending edits applied, leaving this one as it is."""
+        pages, out_ptr, out_links, _ = self._merged_edges()
+        return LinkGraph(pages, out_ptr, out_links)
+
+    def patch(self, links=None, removed=()):
+        """
+        Update the graph in place: `edit` followed by `merge`.
+        Return an array mapping each old page id to its new id, or -1 if removed.
+        """
+        self.edit(links, removed)
+        return self.merge()
+
+
+def as_graph(corpus):
+    """
+    Accept either a corpus dictionary or an already compiled LinkGraph. A
+    graph with pending edits is handed over as a merged copy, so callers
+    always get consistent CSR arrays and the original keeps its page ids.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus.merged() if corpus.replaced else corpus
+    return LinkGraph.from_corpus(corpus)
+
+
+# Page name -> id table shared with crawl workers through the pool initializer
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _link_names(path):
+    """
+    Return the set of link targets found in the HTML file at `path`,
+    excluding links from the page to itself. Large files are memory mapped
+    rather than read into a string, and the link regex runs directly over
+    the mapped bytes.
+    """
+    own_name = os.path.basename(path)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            names = set(LINK_PATTERN.findall(f.read()))
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+                names = set(LINK_PATTERN.findall(contents))
+    names = set(name.decode(errors="replace") for name in names)
+    names.discard(own_name)
+    return names
+
+
+def _extract_links(path, index=None):
+    """
+    Return the sorted ids of pages in the corpus linked to by the HTML file
+    at `path`, dropping links that leave the corpus.
+    """
+    index = index if index is not None else _worker_index
+    return array("i", sorted(index[name] for name in _link_names(path) if name in index))
+
+
+def _map_paths(function, paths, processes, chunksize, initargs=()):
+    """
+    Yield `function(path)` for each path in order, in a process pool unless
+    there are too few paths to be worth it or `processes` is 1.
+    """
+    if processes == 1 or len(paths) < PARALLEL_THRESHOLD:
+        if initargs:
+            _init_worker(*initargs)
+        yield from map(function, paths)
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=initargs or (None,)) as pool:
+            yield from pool.imap(function, paths, chunksize)
+
+
+def _page_stamps(directory):
+    """
+    Return a dictionary mapping each HTML file name in `directory` to its
+    (modification time in ns, size) stamp, sorted by file name.
+    """
+    stamps = dict()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                stamps[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return dict(sorted(stamps.items()))
+
+
+def scan_corpus(directory, processes=None, chunksize=64, cache_file=None):
+    """
+    Crawl a directory of HTML pages straight into a LinkGraph.
+
+    File names are found with `os.scandir` and interned to integer ids up
+    front, so links leaving the corpus are dropped as they are parsed instead
+    of in a second pass. Link extraction runs in a process pool of
+    `processes` workers (all cores by default; 1 crawls in this process) and
+    each page's link ids are streamed into the CSR edge array in order.
+
+    If `cache_file` is given the compiled graph is also written there, and
+    later crawls only re-parse files whose modification time or size changed.
+    """
+    if cache_file is not None:
+        return _cached_scan(directory, processes, chunksize, cache_file)
+
+    pages = list(_page_stamps(directory))
+    index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, page) for page in pages]
+
+    out_ptr = array("q", [0])
+    out_links = array("i")
+    for links in _map_paths(_extract_links, paths, processes, chunksize, (index,)):
+        out_links.extend(links)
+        out_ptr.append(len(out_links))
+
+    return LinkGraph(pages, np.frombuffer(out_ptr, dtype=np.int64),
+                     np.frombuffer(out_links, dtype=np.int32))
+
+
+'''
+Compiled graph cache
+
+A cache file holds an 8 byte magic string, the length of each section as an
+int64, and then the sections themselves, each padded to 8 bytes so it can be
+memory mapped in place:
+
+    out_ptr, out_links    CSR arrays of the graph itself
+    raw_ptr, raw_links    CSR arrays of every link found in each page, as ids
+                          into the name table, including links leaving the corpus
+    mtimes, sizes         stamp of each page when it was parsed
+    names                 NUL separated name table: the N page names first,
+                          then every other link target
+
+The raw links let a page that did not change keep its links when pages are
+added or removed around it, without parsing it again.
+'''
+CACHE_MAGIC = b"PRGRAPH1"
+CACHE_SECTIONS = [
+    ("out_ptr", np.int64),
+    ("raw_ptr", np.int64),
+    ("mtimes", np.int64),
+    ("sizes", np.int64),
+    ("out_links", np.int32),
+    ("raw_links", np.int32),
+    ("names", np.uint8),
+]
+
+
+def write_cache(cache_file, sections):
+    """
+    Write a dictionary of section name -> array to `cache_file`.
+    The file is written beside the target and renamed into place, so a
+    crawl interrupted part way never leaves a truncated cache behind.
+    """
+    arrays = [np.ascontiguousarray(sections[name], dtype=dtype) for name, dtype in CACHE_SECTIONS]
+    temp_file = f"{cache_file}.tmp"
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(np.array([len(a) for a in arrays], dtype=np.int64).tobytes())
+            for a in arrays:
+                f.write(a.tobytes())
+                f.write(bytes(-a.nbytes % 8))
+        os.replace(temp_file, cache_file)
+    except OSError:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def read_cache(cache_file):
+    """
+    Memory map `cache_file` and return a dictionary of section name -> array,
+    or None if there is no usable cache.
+    """
+    try:
+        data = np.memmap(cache_file, dtype=np.uint8, mode="r")
+    except (OSError, ValueError):
+        return None
+    header_size = len(CACHE_MAGIC) + 8 * len(CACHE_SECTIONS)
+    if len(data) < header_size or bytes(data[:len(CACHE_MAGIC)]) != CACHE_MAGIC:
+        return None
+    lengths = data[len(CACHE_MAGIC):header_size].view(np.int64)
+
+    sections = dict()
+    offset = header_size
+    for (name, dtype), length in zip(CACHE_SECTIONS, lengths):
+        nbytes = int(length) * np.dtype(dtype).itemsize
+        if offset + nbytes > len(data):
+            return None
+        sections[name] = data[offset:offset + nbytes].view(dtype)
+        offset += nbytes + (-nbytes % 8)
+    return sections
+
+
+def _cached_scan(directory, processes, chunksize, cache_file):
+    """
+    Crawl `directory` into a LinkGraph through the cache file.
+
+    If every page's stamp matches the cache the graph is memory mapped
+    straight from it without parsing any HTML. Otherwise only new or changed
+    pages are parsed, links of unchanged pages are re-resolved against the
+    new set of pages, and the cache is rewritten if it can be.
+    """
+    stamps = _page_stamps(directory)
+    pages = list(stamps)
+    num_pages = len(pages)
+    mtimes = np.array([stamp[0] for stamp in stamps.values()], dtype=np.int64)
+    sizes = np.array([stamp[1] for stamp in stamps.values()], dtype=np.int64)
+
+    cache = read_cache(cache_file)
+    cached_names = []
+    if cache is not None:
+        cached_names = bytes(cache["names"]).decode().split("\0") if len(cache["names"]) else []
+        num_cached = len(cache["mtimes"])
+
+        # Warm start: nothing changed, so the cached graph is the answer
+        if (cached_names[:num_cached] == pages and np.array_equal(cache["mtimes"], mtimes)
+                and np.array_equal(cache["sizes"], sizes)):
+            return LinkGraph(pages, cache["out_ptr"], cache["out_links"])
+
+    # Name table for the new graph: pages first, then any other link target
+    names = {page: i for i, page in enumerate(pages)}
+
+    def intern(name):
+        return names.setdefault(name, len(names))
+
+    # Pages whose stamp matches the cache keep their raw links, renumbered
+    reusable = dict()
+    if cache is not None:
+        remap = np.array([intern(name) for name in cached_names], dtype=np.int32)
+        for i in range(num_cached):
+            page = cached_names[i]
+            if stamps.get(page) == (int(cache["mtimes"][i]), int(cache["sizes"][i])):
+                start, end = cache["raw_ptr"][i], cache["raw_ptr"][i + 1]
+                reusable[names[page]] = remap[cache["raw_links"][start:end]]
+
+    stale = [i for i in range(num_pages) if i not in reusable]
+    parsed = _map_paths(_link_names, [os.path.join(directory, pages[i]) for i in stale],
+                        processes, chunksize)
+    for i, links in zip(stale, parsed):
+        reusable[i] = np.array([intern(name) for name in links if "\0" not in name], dtype=np.int32)
+
+    raw = [reusable[i] for i in range(num_pages)]
+    raw_ptr = np.zeros(num_pages + 1, dtype=np.int64)
+    np.cumsum([len(links) for links in raw], out=raw_ptr[1:])
+    raw_links = np.concatenate(raw) if raw else np.zeros(0, dtype=np.int32)
+
+    # Keep only links inside the corpus, sorted within each page
+    rows = np.repeat(np.arange(num_pages), np.diff(raw_ptr))
+    inside = raw_links < num_pages
+    rows, links = rows[inside], raw_links[inside]
+    order = np.lexsort((links, rows))
+    out_links = links[order]
+    out_ptr = np.zeros(num_pages + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_pages), out=out_ptr[1:])
+
+    # A cache that cannot be written (read-only corpus, full disk) only
+    # costs the next crawl its warm start
+    try:
+        write_cache(cache_file, {
+            "out_ptr": out_ptr,
+            "raw_ptr": raw_ptr,
+            "mtimes": mtimes,
+            "sizes": sizes,
+            "out_links": out_links,
+            "raw_links": raw_links,
+            "names": np.frombuffer("\0".join(names).encode(), dtype=np.uint8),
+        })
+    except OSError:
+        pass
+    return LinkGraph(pages, out_ptr, out_links)
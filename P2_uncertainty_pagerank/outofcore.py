@@ -0,0 +1,198 @@
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from linkgraph import _extract_links, _map_paths, _page_stamps, as_graph
+
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Edges and pages handled per block; only blocks this size are ever in memory
+BLOCK_EDGES = 1 << 22
+BLOCK_PAGES = 1 << 20
+
+# Number of target ranges edges are partitioned into while a store is built
+BUCKETS = 64
+
+'''
+Edge store layout
+
+An edge store is a directory holding a graph too large to keep in Python
+objects, as flat arrays that are memory mapped rather than loaded:
+
+    pages.txt          page names, one per line, in page id order
+    out_degree.npy     int32 number of links on each page
+    sources.npy        int32 source page of every edge
+    targets.npy        int32 target page of every edge, sorted ascending
+    rank.npy           float64 rank vector, written by out_of_core_pagerank
+
+Because edges are sorted by target, each block of edges only touches a
+contiguous range of the next rank vector.
+'''
+
+
+def build_edge_store(store_dir, pages, edge_blocks, buckets=BUCKETS):
+    """
+    Write an edge store for `pages` from an iterable of (sources, targets)
+    arrays of page ids, without holding more than one block of edges in
+    memory at a time.
+
+    Edges are first appended to one scratch file per range of target ids,
+    then each range is sorted on its own and appended to the store, which
+    amounts to an external bucket sort by target.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    num_pages = len(pages)
+    with open(os.path.join(store_dir, "pages.txt"), "w") as f:
+        f.writelines(f"{page}\n" for page in pages)
+
+    out_degree = open_memmap(os.path.join(store_dir, "out_degree.npy"), mode="w+",
+                             dtype=np.int32, shape=(num_pages,))
+    out_degree[:] = 0
+    width = max(1, -(-num_pages // buckets))
+    bucket_paths = [os.path.join(store_dir, f"bucket{k}.tmp") for k in range(buckets)]
+    bucket_files = [open(path, "wb") for path in bucket_paths]
+
+    # Pass 1: count links per page and scatter edges into target ranges
+    num_edges = 0
+    try:
+        for sources, targets in edge_blocks:
+            sources = np.asarray(sources, dtype=np.int32)
+            targets = np.asarray(targets, dtype=np.int32)
+            if not len(sources):
+                continue
+            num_edges += len(sources)
+            low, high = int(sources.min()), int(sources.max())
+            out_degree[low:high + 1] += np.bincount(sources - low, minlength=high - low + 1).astype(np.int32)
+
+            bucket = targets // width
+            order = np.argsort(bucket, kind="stable")
+            pairs = np.column_stack([sources[order], targets[order]])
+            bounds = np.searchsorted(bucket[order], np.arange(buckets + 1))
+            for k in range(buckets):
+                if bounds[k] < bounds[k + 1]:
+                    bucket_files[k].write(pairs[bounds[k]:bounds[k + 1]].tobytes())
+    finally:
+        for f in bucket_files:
+            f.close()
+    out_degree.flush()
+
+    # Pass 2: sort each target range and append it to the edge arrays
+    sources = open_memmap(os.path.join(store_dir, "sources.npy"), mode="w+",
+                          dtype=np.int32, shape=(num_edges,))
+    targets = open_memmap(os.path.join(store_dir, "targets.npy"), mode="w+",
+                          dtype=np.int32, shape=(num_edges,))
+    offset = 0
+    for path in bucket_paths:
+        pairs = np.fromfile(path, dtype=np.int32).reshape(-1, 2)
+        order = np.lexsort((pairs[:, 0], pairs[:, 1]))
+        sources[offset:offset + len(pairs)] = pairs[order, 0]
+        targets[offset:offset + len(pairs)] = pairs[order, 1]
+        offset += len(pairs)
+        os.remove(path)
+    sources.flush()
+    targets.flush()
+
+
+def store_graph(graph, store_dir, block_edges=BLOCK_EDGES):
+    """Write a LinkGraph that fits in memory out to an edge store, with any pending edits applied."""
+    graph = as_graph(graph)
+    sources = np.repeat(np.arange(graph.num_pages, dtype=np.int32), graph.out_degree)
+    blocks = ((sources[i:i + block_edges], graph.out_links[i:i + block_edges])
+              for i in range(0, graph.num_edges, block_edges))
+    build_edge_store(store_dir, graph.pages, blocks)
+
+
+def store_corpus(directory, store_dir, processes=None, block_edges=BLOCK_EDGES):
+    """
+    Crawl a directory of HTML pages straight into an edge store. Only page
+    names are kept in memory; links are parsed in a process pool and
+    streamed to disk in blocks of `block_edges` edges.
+    """
+    pages = list(_page_stamps(directory))
+    index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, page) for page in pages]
+
+    def blocks():
+        sources, targets = [], []
+        pending = 0
+        for i, links in enumerate(_map_paths(_extract_links, paths, processes, 64, (index,))):
+            sources.append(np.full(len(links), i, dtype=np.int32))
+            targets.append(np.frombuffer(links, dtype=np.int32))
+            pending += len(links)
+            if pending >= block_edges:
+                yield np.concatenate(sources), np.concatenate(targets)
+                sources, targets = [], []
+                pending = 0
+        if pending:
+            yield np.concatenate(sources), np.concatenate(targets)
+
+    build_edge_store(store_dir, pages, blocks())
+
+
+def out_of_core_pagerank(store_dir, damping_factor, tolerance=TOLERANCE,
+                         max_iterations=MAX_ITERATIONS, block_edges=BLOCK_EDGES,
+                         block_pages=BLOCK_PAGES):
+    """
+    Run power iteration over an edge store, streaming edges and pages in
+    blocks so that neither the graph nor the rank vectors need to fit in
+    memory. The rank vectors are float64 files memory mapped in the store.
+
+    Return the final rank vector, memory mapped from `rank.npy` in the store.
+    """
+    out_degree = np.load(os.path.join(store_dir, "out_degree.npy"), mmap_mode="r")
+    sources = np.load(os.path.join(store_dir, "sources.npy"), mmap_mode="r")
+    targets = np.load(os.path.join(store_dir, "targets.npy"), mmap_mode="r")
+    num_pages = len(out_degree)
+    num_edges = len(sources)
+
+    def vector(name):
+        return open_memmap(os.path.join(store_dir, name), mode="w+", dtype=np.float64,
+                           shape=(num_pages,))
+
+    rank, new_rank, share = vector("rank.npy"), vector("next.tmp.npy"), vector("share.tmp.npy")
+    page_blocks = [slice(a, min(a + block_pages, num_pages)) for a in range(0, num_pages, block_pages)]
+    for block in page_blocks:
+        rank[block] = 1 / num_pages
+
+    for _ in range(max_iterations):
+        # Rank each page sends along each link, and rank held by dangling pages
+        dangling_rank = 0
+        for block in page_blocks:
+            degree = out_degree[block]
+            dangling_rank += rank[block][degree == 0].sum()
+            share[block] = np.divide(rank[block], degree, out=np.zeros(len(degree)), where=degree > 0)
+        base = (1 - damping_factor) / num_pages + damping_factor * dangling_rank / num_pages
+
+        for block in page_blocks:
+            new_rank[block] = base
+
+        # Edges are sorted by target, so a block only touches a range of new_rank
+        for a in range(0, num_edges, block_edges):
+            block_targets = np.asarray(targets[a:a + block_edges])
+            low, high = int(block_targets[0]), int(block_targets[-1])
+            inflow = np.bincount(block_targets - low, weights=share[np.asarray(sources[a:a + block_edges])],
+                                 minlength=high - low + 1)
+            new_rank[low:high + 1] += damping_factor * inflow
+
+        residual = 0
+        for block in page_blocks:
+            residual += np.abs(new_rank[block] - rank[block]).sum()
+            rank[block] = new_rank[block]
+        if residual < tolerance:
+            break
+
+    rank.flush()
+    del new_rank, share
+    os.remove(os.path.join(store_dir, "next.tmp.npy"))
+    os.remove(os.path.join(store_dir, "share.tmp.npy"))
+    return rank
+
+
+def load_ranks(store_dir):
+    """Return the page -> rank dictionary for an edge store that has been ranked."""
+    with open(os.path.join(store_dir, "pages.txt")) as f:
+        pages = f.read().splitlines()
+    rank = np.load(os.path.join(store_dir, "rank.npy"), mmap_mode="r")
+    return {page: float(rank[i]) for i, page in enumerate(pages)}
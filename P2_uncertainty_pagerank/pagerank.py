@@ -9,15 +9,38 @@ corpus_dirs = ['corpus0', 'corpus1', 'corpus2']
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Alternative engines selectable from the command line
+ENGINES = ['sparse', 'compiled', 'walkers', 'gauss-seidel', 'extrapolation', 'adaptive', 'parallel']
+
+# Directory the engines keep compiled link graph caches in, one file per
+# corpus; if it is not set they crawl without a cache
+CACHE_DIR = os.environ.get('PAGERANK_CACHE_DIR')
+CACHE_NAME = '.pagerank-cache'
+
 
 def main():
+    engine = None
     if not debug:   # Allows running from command line else from IDE
-        if len(sys.argv) != 2:
-            sys.exit("Usage: python pagerank.py corpus")
-        corpus = crawl(sys.argv[1])
+        if len(sys.argv) not in [2, 3]:
+            sys.exit(f"Usage: python pagerank.py corpus [{'|'.join(ENGINES)}]")
+        engine = sys.argv[2] if len(sys.argv) == 3 else None
+        if engine is None:
+            corpus = crawl(sys.argv[1])
     else:
         # Make a dictionary where keys are html file names and values are html file names linked to by the key file
         corpus = crawl(corpus_dirs[0])
+
+    # An engine named on the command line replaces the two reference models
+    if engine is not None:
+        # Engines work on integer ids, so crawl straight into a compiled graph
+        from linkgraph import scan_corpus
+        graph = scan_corpus(sys.argv[1], cache_file=cache_path(sys.argv[1]))
+        title, ranks = run_engine(engine, graph)
+        print(f"PageRank Results from {title}")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        return
+
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -41,12 +64,59 @@ def main():
         print(iterate_pagerank(test_corpus, DAMPING))
 
 
-def crawl(directory):
+def run_engine(engine, corpus):
+    """
+    Run one of the alternative PageRank engines in ENGINES over `corpus`.
+    Engines are imported on demand since they depend on numpy.
+
+    Return a (title, ranks) pair where ranks maps page names to PageRank values.
+    """
+    if engine == 'sparse':
+        from solvers import sparse_pagerank
+        return "Sparse Iteration", sparse_pagerank(corpus, DAMPING)
+    if engine == 'compiled':
+        from sampling import compiled_sample_pagerank
+        return f"Compiled Sampling (n = {SAMPLES})", compiled_sample_pagerank(corpus, DAMPING, SAMPLES)
+    if engine == 'walkers':
+        from sampling import batched_sample_pagerank
+        ranks, errors = batched_sample_pagerank(corpus, DAMPING)
+        return f"Batched Sampling (max error {max(errors.values()):.4f})", ranks
+    if engine in ['gauss-seidel', 'extrapolation', 'adaptive']:
+        from solvers import solve_pagerank
+        ranks, history = solve_pagerank(corpus, DAMPING, engine)
+        iterations = len(history['residuals'])
+        return f"{engine.capitalize()} Solver ({iterations} iterations, {sum(history['seconds']):.4f}s)", ranks
+    if engine == 'parallel':
+        from parallel import parallel_pagerank
+        return f"Parallel Iteration ({os.cpu_count()} processes)", parallel_pagerank(corpus, DAMPING)
+    sys.exit(f"Unknown engine {engine}, expected one of {', '.join(ENGINES)}")
+
+
+def cache_path(directory):
+    """
+    Return the graph cache file the engines use for a corpus directory, in
+    CACHE_DIR and named after the directory's absolute path, or None if
+    CACHE_DIR is not set.
+    """
+    if CACHE_DIR is None:
+        return None
+    name = os.path.abspath(directory).strip(os.sep).replace(os.sep, '_')
+    return os.path.join(CACHE_DIR, name + CACHE_NAME)
+
+
+def crawl(directory, cache_file=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    If `cache_file` is given, the links are loaded from that compiled graph
+    cache instead, re-parsing only pages that changed since it was written.
     """
+    if cache_file is not None:
+        from linkgraph import scan_corpus
+        return scan_corpus(directory, cache_file=cache_file).to_corpus()
+
     pages = dict()
 
     # Extract all links from HTML files
@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from linkgraph import as_graph
+from solvers import MAX_ITERATIONS, TOLERANCE
+
+
+def partition(graph, processes):
+    """
+    Split page ids into `processes` contiguous blocks of roughly equal work,
+    counting each page as one unit plus one per inbound link.
+    Return the block boundaries as a list of length processes + 1.
+    """
+    in_ptr, _, _ = graph.inbound
+    work = in_ptr + np.arange(graph.num_pages + 1)
+    targets = np.linspace(0, work[-1], processes + 1)
+    bounds = np.searchsorted(work, targets).tolist()
+    bounds[0], bounds[-1] = 0, graph.num_pages
+    return bounds
+
+
+def _attach(specs):
+    """
+    Attach to the shared memory blocks described by `specs`, a dictionary of
+    name -> (block name, dtype, shape). Return (blocks, arrays), keeping
+    the blocks so they stay mapped while the arrays are in use.
+    """
+    blocks, arrays = [], dict()
+    for name, (block_name, dtype, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+def _worker(w, bounds, specs, damping_factor, tolerance, max_iterations, barrier):
+    """
+    Update the ranks of pages bounds[w]..bounds[w + 1] every iteration.
+
+    Each iteration has two phases separated by barriers: first every worker
+    publishes the share of rank its pages send along each link and the rank
+    held by its dangling pages, then every worker gathers its block's inbound
+    contributions from the shared shares and publishes its part of the L1
+    residual. All workers read the same residuals, so they agree on when to stop.
+    """
+    blocks, arrays = _attach(specs)
+    try:
+        rank, new_rank, share = arrays["rank"], arrays["new_rank"], arrays["share"]
+        dangling_parts, residual_parts = arrays["dangling_parts"], arrays["residual_parts"]
+        in_ptr, in_links, in_targets = arrays["in_ptr"], arrays["in_links"], arrays["in_targets"]
+        out_degree = arrays["out_degree"]
+        num_pages = len(rank)
+
+        a, b = bounds[w], bounds[w + 1]
+        edges = slice(in_ptr[a], in_ptr[b])
+        block_sources = in_links[edges]
+        block_rows = in_targets[edges] - a
+        degree = out_degree[a:b]
+        dangling = degree == 0
+
+        for _ in range(max_iterations):
+            share[a:b] = np.divide(rank[a:b], degree, out=np.zeros(b - a), where=~dangling)
+            dangling_parts[w] = rank[a:b][dangling].sum()
+            barrier.wait()
+
+            inflow = np.bincount(block_rows, weights=share[block_sources], minlength=b - a)
+            new_rank[a:b] = (1 - damping_factor) / num_pages + damping_factor * (
+                inflow + dangling_parts.sum() / num_pages)
+            residual_parts[w] = np.abs(new_rank[a:b] - rank[a:b]).sum()
+            barrier.wait()
+
+            rank[a:b] = new_rank[a:b]
+            if residual_parts.sum() < tolerance:
+                break
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+def parallel_power_iteration(graph, damping_factor, processes=None, tolerance=TOLERANCE,
+                             max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of a LinkGraph by power iteration sharded
+    over `processes` worker processes (all cores by default).
+
+    The graph and the rank vectors live in `multiprocessing.shared_memory`,
+    so workers read each other's results without copying, and iterations are
+    kept in step with a barrier. The result matches `power_iteration`.
+    """
+    processes = processes or os.cpu_count()
+    processes = max(1, min(processes, graph.num_pages))
+    in_ptr, in_links, in_targets = graph.inbound
+    initial = {
+        "rank": np.full(graph.num_pages, 1 / graph.num_pages),
+        "new_rank": np.zeros(graph.num_pages),
+        "share": np.zeros(graph.num_pages),
+        "dangling_parts": np.zeros(processes),
+        "residual_parts": np.zeros(processes),
+        "in_ptr": in_ptr,
+        "in_links": in_links,
+        "in_targets": in_targets,
+        "out_degree": graph.out_degree,
+    }
+
+    blocks, specs = [], dict()
+    try:
+        for name, array in initial.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            specs[name] = (block.name, array.dtype.str, array.shape)
+
+        barrier = multiprocessing.Barrier(processes)
+        bounds = partition(graph, processes)
+        workers = [
+            multiprocessing.Process(target=_worker, args=(
+                w, bounds, specs, damping_factor, tolerance, max_iterations, barrier))
+            for w in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode != 0 for worker in workers):
+            raise RuntimeError("a PageRank worker process failed")
+
+        _, dtype, shape = specs["rank"]
+        rank_block = blocks[list(specs).index("rank")]
+        return np.ndarray(shape, dtype=dtype, buffer=rank_block.buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def parallel_pagerank(corpus, damping_factor, processes=None, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page like `sparse_pagerank`, computed by
+    `processes` worker processes sharing the rank vectors.
+    """
+    graph = as_graph(corpus)
+    return graph.to_ranks(parallel_power_iteration(graph, damping_factor, processes, tolerance))
@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+
+from linkgraph import as_graph
+
+
+class RandomSurfer():
+    """
+    Random surfer compiled once from a corpus so each step costs O(1).
+
+    Every step is a two-stage draw over integer page ids: with probability
+    `damping_factor` follow a link chosen uniformly from the current page's
+    slice of the outbound CSR arrays, otherwise (or if the page has no links)
+    teleport to a page chosen uniformly from the whole corpus. This is exactly
+    the distribution returned by `transition_model`, without building it.
+    """
+
+    def __init__(self, corpus, damping_factor):
+        self.graph = as_graph(corpus)
+        self.damping_factor = damping_factor
+
+        # Plain Python lists index faster than numpy arrays one element at a time
+        self.out_ptr = self.graph.out_ptr.tolist()
+        self.out_links = self.graph.out_links.tolist()
+
+    def walk(self, n, seed=None):
+        """
+        Take `n` samples, the first chosen uniformly at random and each of
+        the rest from the previous sample's transition model.
+        Return a list with the number of visits to each page id.
+        """
+        rng = random.Random(seed)
+        uniform = rng.random
+        num_pages = self.graph.num_pages
+        out_ptr = self.out_ptr
+        out_links = self.out_links
+        damping_factor = self.damping_factor
+        hits = [0] * num_pages
+
+        page = int(uniform() * num_pages)
+        hits[page] += 1
+        for _ in range(n - 1):
+            start = out_ptr[page]
+            num_links = out_ptr[page + 1] - start
+            if num_links and uniform() < damping_factor:
+                page = out_links[start + int(uniform() * num_links)]
+            else:
+                page = int(uniform() * num_pages)
+            hits[page] += 1
+        return hits
+
+    def pagerank(self, n, seed=None):
+        """Return a page -> estimated PageRank dictionary from `n` samples."""
+        hits = self.walk(n, seed)
+        return self.graph.to_ranks([count / n for count in hits])
+
+
+def compiled_sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page like `sample_pagerank`, compiling
+    the transition tables once up front so each of the `n` samples is O(1).
+    Passing `seed` makes the result reproducible.
+    """
+    return RandomSurfer(corpus, damping_factor).pagerank(n, seed)
+
+
+def batched_sample_pagerank(corpus, damping_factor, confidence_width=0.01, walkers=4096,
+                            round_steps=32, z=1.96, max_samples=10**8, seed=None):
+    """
+    Estimate PageRank with `walkers` independent random surfers advanced in
+    lockstep as a numpy array of page ids, stopping as soon as every page's
+    confidence interval (z standard errors either side) is narrower than
+    `confidence_width`, or after `max_samples` samples.
+
+    Samples are grouped into rounds of `round_steps` steps of every walker.
+    Each round gives an independent estimate of the rank vector, and the
+    standard error of a page is the spread of its round estimates. Walkers
+    start uniformly at random and are burned in until the start
+    distribution's remaining weight, damping_factor ** steps, is negligible.
+
+    Return (ranks, errors): dictionaries mapping each page to its estimated
+    PageRank and to the standard error of that estimate.
+    """
+    graph = as_graph(corpus)
+    rng = np.random.default_rng(seed)
+    num_pages = graph.num_pages
+    out_ptr = graph.out_ptr
+    out_links = graph.out_links
+    out_degree = graph.out_degree
+
+    def step(pages):
+        # Follow a random link with probability damping_factor, otherwise teleport
+        degree = out_degree[pages]
+        follow = (rng.random(walkers) < damping_factor) & (degree > 0)
+        offsets = (rng.random(walkers) * degree).astype(np.int64)
+        new_pages = rng.integers(num_pages, size=walkers)
+        new_pages[follow] = out_links[out_ptr[pages[follow]] + offsets[follow]]
+        return new_pages
+
+    pages = rng.integers(num_pages, size=walkers)
+    burn_in = int(np.ceil(np.log(1e-6) / np.log(damping_factor))) if 0 < damping_factor < 1 else 0
+    for _ in range(burn_in):
+        pages = step(pages)
+
+    # Running first and second moments of the per-round estimates
+    total = np.zeros(num_pages)
+    total_squares = np.zeros(num_pages)
+    rounds = 0
+    min_rounds = 8
+    while True:
+        counts = np.zeros(num_pages)
+        for _ in range(round_steps):
+            pages = step(pages)
+            counts += np.bincount(pages, minlength=num_pages)
+        estimate = counts / (walkers * round_steps)
+        total += estimate
+        total_squares += estimate * estimate
+        rounds += 1
+
+        mean = total / rounds
+        variance = np.maximum(total_squares / rounds - mean * mean, 0) * rounds / max(rounds - 1, 1)
+        errors = np.sqrt(variance / rounds)
+        if rounds >= min_rounds and 2 * z * errors.max() <= confidence_width:
+            break
+        if rounds * walkers * round_steps >= max_samples:
+            break
+
+    return graph.to_ranks(mean), graph.to_ranks(errors)
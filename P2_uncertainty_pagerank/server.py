@@ -0,0 +1,189 @@
+import asyncio
+import json
+import math
+import socket
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from linkgraph import scan_corpus
+from pagerank import DAMPING, cache_path
+from solvers import personalized_power_iteration, power_iteration, teleport_matrix
+
+HOST = "127.0.0.1"
+PORT = 8050
+
+# Number of answered queries kept for identical repeat requests
+RESULT_CACHE_SIZE = 1024
+
+
+class PageRankServer():
+    """
+    Long-running PageRank query server over a corpus directory.
+
+    The compiled graph and the latest rank vector stay in memory between
+    queries. Clients send one JSON object per line and get one JSON object
+    back per line:
+
+        {"query": "top", "k": 10}                         -> {"pages": [[page, rank], ...]}
+        {"query": "rank", "page": "1.html"}               -> {"page": "1.html", "rank": 0.22}
+        {"query": "personalized", "seeds": [...], "k": 10} -> {"pages": [[page, rank], ...]}
+        {"query": "reload"}                               -> {"pages": number of pages}
+
+    `k` is a non-negative integer, and `seeds` is a list of pages or an object
+    mapping pages to non-negative weights.
+    Answers are kept in an LRU cache keyed by the request, and identical
+    requests that arrive while one is being solved wait for the same answer.
+    Solves run in an executor so the event loop keeps serving other clients.
+    """
+
+    def __init__(self, directory, damping_factor=DAMPING, cache_size=RESULT_CACHE_SIZE):
+        self.directory = directory
+        self.damping_factor = damping_factor
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.state = None       # (graph, rank, order), swapped whole by `load`
+
+    def load(self):
+        """Crawl the corpus through its graph cache and solve PageRank."""
+        graph = scan_corpus(self.directory, cache_file=cache_path(self.directory))
+        rank = power_iteration(graph, self.damping_factor)
+        self.state = (graph, rank, np.argsort(-rank, kind="stable"))
+
+    @staticmethod
+    def top(graph, rank, order, k):
+        """Return the `k` highest ranked pages as [page, rank] pairs."""
+        return [[graph.pages[i], float(rank[i])] for i in order[:k]]
+
+    @staticmethod
+    def k_error(k):
+        """Return why `k` is not a number of pages to return, or None if it is."""
+        if isinstance(k, bool) or not isinstance(k, int) or k < 0:
+            return "k must be a non-negative integer"
+        return None
+
+    @staticmethod
+    def seeds_error(graph, seeds):
+        """
+        Return why `seeds` cannot be teleported to, or None if it can: it must
+        be a non-empty list or object of pages in the corpus, and an object's
+        weights must be finite, non-negative numbers with a positive sum.
+        """
+        if (not isinstance(seeds, (list, dict)) or not seeds
+                or any(not isinstance(page, str) or page not in graph.index for page in seeds)):
+            return "seeds must be a non-empty list or object of pages in the corpus"
+        if isinstance(seeds, dict):
+            weights = list(seeds.values())
+            if (not all(isinstance(weight, (int, float)) and not isinstance(weight, bool)
+                        and math.isfinite(weight) and weight >= 0 for weight in weights)
+                    or not 0 < sum(weights) < math.inf):
+                return "seed weights must be finite, non-negative numbers with a positive sum"
+        return None
+
+    def personalized(self, graph, seeds, k):
+        """Solve PageRank on `graph` teleporting to `seeds` and return its top `k` pages."""
+        teleport = teleport_matrix(graph, [seeds])
+        rank = personalized_power_iteration(graph, self.damping_factor, teleport)[:, 0]
+        return self.top(graph, rank, np.argsort(-rank, kind="stable"), k)
+
+    async def answer(self, request):
+        """
+        Return the response object for one request, without the result cache.
+        Every query works on the graph and ranks loaded when it arrived, even
+        if a reload finishes while it is being solved.
+        """
+        query = request.get("query")
+        loop = asyncio.get_running_loop()
+        graph, rank, order = self.state
+        if query in ("top", "personalized"):
+            k = request.get("k", 10)
+            error = self.k_error(k)
+            if error is not None:
+                return {"error": error}
+        if query == "top":
+            return {"pages": self.top(graph, rank, order, k)}
+        if query == "rank":
+            page = request.get("page")
+            if not isinstance(page, str) or page not in graph.index:
+                return {"error": f"unknown page {page}"}
+            return {"page": page, "rank": float(rank[graph.index[page]])}
+        if query == "personalized":
+            seeds = request.get("seeds")
+            error = self.seeds_error(graph, seeds)
+            if error is not None:
+                return {"error": error}
+            return {"pages": await loop.run_in_executor(None, self.personalized, graph, seeds, k)}
+        if query == "reload":
+            await loop.run_in_executor(None, self.load)
+            self.results.clear()
+            return {"pages": self.state[0].num_pages}
+        return {"error": f"unknown query {query}"}
+
+    async def cached_answer(self, request):
+        """
+        Return the response for `request`, sharing answers between identical
+        requests through the LRU result cache.
+        """
+        if request.get("query") == "reload":
+            return await self.answer(request)
+
+        key = json.dumps(request, sort_keys=True)
+        if key in self.results:
+            self.results.move_to_end(key)
+            return await asyncio.shield(self.results[key])
+
+        future = asyncio.ensure_future(self.answer(request))
+        self.results[key] = future
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self.results.pop(key, None)
+            raise
+
+    async def handle(self, reader, writer):
+        """Answer newline-delimited JSON requests from one client until it disconnects."""
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.cached_answer(json.loads(line))
+                except Exception as error:
+                    # One bad request gets an error back instead of closing the connection
+                    response = {"error": str(error) or type(error).__name__}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        """Load the corpus and serve clients until cancelled."""
+        await asyncio.get_running_loop().run_in_executor(None, self.load)
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def query(request, host=HOST, port=PORT):
+    """Send one request to a running server and return its response."""
+    with socket.create_connection((host, port)) as connection:
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        with connection.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python server.py corpus [port]")
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else PORT
+    server = PageRankServer(sys.argv[1])
+    print(f"Serving PageRank for {sys.argv[1]} on {HOST}:{port}")
+    try:
+        asyncio.run(server.serve(HOST, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
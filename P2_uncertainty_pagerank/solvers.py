@@ -0,0 +1,598 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from linkgraph import as_graph
+
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Blocks per block Gauss-Seidel sweep, unless a block size is given
+BLOCKS = 64
+
+# Sweeps in a row a page must stay still before Adaptive PageRank freezes it
+FREEZE_SWEEPS = 3
+
+# Iterations between quadratic extrapolation steps
+EXTRAPOLATION_PERIOD = 10
+
+# Fraction of the edges that pending graph edits may hold before
+# IncrementalPageRank merges them into the CSR arrays
+MERGE_FRACTION = 0.05
+
+
+def transition_product(graph, rank, damping_factor):
+    """
+    Return one application of the PageRank operator to `rank`.
+
+    Every page receives (1 - d) / N from teleporting, d * PR(i) / NumLinks(i)
+    from each page i linking to it, and an equal share of d * (total rank of
+    dangling pages), since a page without links is treated as linking to
+    every page. The link term is a single sparse matrix-vector product
+    over the inbound CSR arrays, so the cost is O(E) rather than O(N^2).
+    """
+    num_pages = graph.num_pages
+    _, in_links, in_targets = graph.inbound
+
+    # Rank each page sends along each of its links
+    share = np.zeros(num_pages)
+    linked = ~graph.dangling
+    share[linked] = rank[linked] / graph.out_degree[linked]
+
+    new_rank = np.bincount(in_targets, weights=share[in_links], minlength=num_pages)
+    new_rank *= damping_factor
+    new_rank += (1 - damping_factor) / num_pages
+    new_rank += damping_factor * rank[graph.dangling].sum() / num_pages
+    return new_rank
+
+
+def new_history():
+    """Return an empty per-iteration telemetry record for the solvers below."""
+    return {"residuals": [], "seconds": []}
+
+
+def record(history, residual, start):
+    """Append one iteration's L1 residual and elapsed time to `history`."""
+    if history is not None:
+        history["residuals"].append(float(residual))
+        history["seconds"].append(time.perf_counter() - start)
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    history=None):
+    """
+    Return the PageRank vector of a compiled LinkGraph by power iteration,
+    stopping once the L1 change between sweeps is below `tolerance`.
+    """
+    rank = np.full(graph.num_pages, 1 / graph.num_pages)
+    for _ in range(max_iterations):
+        start = time.perf_counter()
+        new_rank = transition_product(graph, rank, damping_factor)
+        residual = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        record(history, residual, start)
+        if residual < tolerance:
+            break
+    return rank
+
+
+def gauss_seidel(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                 history=None, block_size=None):
+    """
+    Return the PageRank vector by block Gauss-Seidel sweeps.
+
+    Pages are updated a block of `block_size` pages at a time (by default
+    N / BLOCKS, at least 1), and each block already sees the new ranks of
+    the blocks before it in the same sweep. Within a block the update is one
+    vectorized gather over the block's inbound edges; a block size of 1 is
+    classic Gauss-Seidel and a block of every page is power iteration.
+    The total rank of dangling pages is kept up to date as blocks change.
+    """
+    num_pages = graph.num_pages
+    if block_size is None:
+        block_size = max(1, num_pages // BLOCKS)
+    in_ptr, in_links, in_targets = graph.inbound
+    linked = ~graph.dangling
+    inverse_degree = np.zeros(num_pages)
+    inverse_degree[linked] = 1 / graph.out_degree[linked]
+
+    rank = np.full(num_pages, 1 / num_pages)
+    share = rank * inverse_degree
+    dangling_rank = rank[graph.dangling].sum()
+    for _ in range(max_iterations):
+        start = time.perf_counter()
+        residual = 0
+        for a in range(0, num_pages, block_size):
+            b = min(a + block_size, num_pages)
+            edges = slice(in_ptr[a], in_ptr[b])
+            new_block = np.bincount(in_targets[edges] - a, weights=share[in_links[edges]],
+                                    minlength=b - a)
+            new_block = (1 - damping_factor) / num_pages + damping_factor * (
+                new_block + dangling_rank / num_pages)
+
+            change = new_block - rank[a:b]
+            residual += np.abs(change).sum()
+            dangling_rank += change[graph.dangling[a:b]].sum()
+            rank[a:b] = new_block
+            share[a:b] = new_block * inverse_degree[a:b]
+
+        # Sweeps mix old and new ranks, so renormalize to keep a distribution
+        total = rank.sum()
+        rank /= total
+        share /= total
+        dangling_rank /= total
+        record(history, residual, start)
+        if residual < tolerance:
+            break
+    return rank
+
+
+def extrapolate(iterates):
+    """
+    Quadratic extrapolation (Kamvar et al.) from the last four iterates.
+
+    Treat the iterates as coming from a sequence whose error lies in the span
+    of the two next-largest eigenvectors, estimate the characteristic
+    polynomial of that span by least squares, and return the combination of
+    iterates that cancels it.
+    """
+    x0, x1, x2, x3 = iterates
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    gamma1, gamma2, gamma3 = gamma[0], gamma[1], 1
+    estimate = (gamma1 + gamma2 + gamma3) * x1 + (gamma2 + gamma3) * x2 + gamma3 * x3
+    estimate = np.maximum(estimate, 0)
+    return estimate / estimate.sum()
+
+
+def extrapolated_power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS, history=None,
+                                 period=EXTRAPOLATION_PERIOD):
+    """
+    Return the PageRank vector by power iteration, replacing the current
+    iterate with a quadratic extrapolation of the last four every `period`
+    iterations.
+    """
+    rank = np.full(graph.num_pages, 1 / graph.num_pages)
+    iterates = deque([rank], maxlen=4)
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        new_rank = transition_product(graph, rank, damping_factor)
+        residual = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        iterates.append(rank)
+        if iteration % period == 0 and len(iterates) == 4 and residual >= tolerance:
+            rank = extrapolate(iterates)
+            iterates.clear()
+            iterates.append(rank)
+        record(history, residual, start)
+        if residual < tolerance:
+            break
+    return rank
+
+
+def adaptive_power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                             max_iterations=MAX_ITERATIONS, history=None,
+                             freeze_sweeps=FREEZE_SWEEPS):
+    """
+    Return the PageRank vector by Adaptive PageRank (Kamvar et al.).
+
+    Most pages converge long before the slowest ones, so once a page's
+    change has stayed below its even share of the tolerance, tolerance / N,
+    for `freeze_sweeps` sweeps in a row, its rank is frozen and it is no
+    longer recomputed. Each sweep only gathers the inbound edges of pages
+    still active, compacting that edge list whenever pages freeze.
+
+    Frozen pages can still drift as the rest of the graph moves, so once the
+    active pages settle every page is released again and the next sweep
+    covers the whole graph. The solver only stops after such a full sweep
+    changes the ranks by less than `tolerance` in L1.
+    """
+    num_pages = graph.num_pages
+    _, in_links, in_targets = graph.inbound
+    linked = ~graph.dangling
+    inverse_degree = np.zeros(num_pages)
+    inverse_degree[linked] = 1 / graph.out_degree[linked]
+
+    rank = np.full(num_pages, 1 / num_pages)
+    active = np.arange(num_pages)
+    quiet = np.zeros(num_pages, dtype=np.int64)    # sweeps each active page has stayed still
+    edge_sources, edge_rows = in_links, in_targets
+    for _ in range(max_iterations):
+        start = time.perf_counter()
+        share = rank * inverse_degree
+        inflow = np.bincount(edge_rows, weights=share[edge_sources], minlength=len(active))
+        new_values = (1 - damping_factor) / num_pages + damping_factor * (
+            inflow + rank[graph.dangling].sum() / num_pages)
+
+        change = new_values - rank[active]
+        residual = np.abs(change).sum()
+        rank[active] = new_values
+        record(history, residual, start)
+        if residual < tolerance:
+            if len(active) == num_pages:
+                break
+            # Release the frozen pages and check the whole graph next sweep
+            active = np.arange(num_pages)
+            quiet = np.zeros(num_pages, dtype=np.int64)
+            edge_sources, edge_rows = in_links, in_targets
+            continue
+
+        # Freeze pages that stopped moving and compact the active edge list
+        quiet = np.where(np.abs(change) < tolerance / num_pages, quiet + 1, 0)
+        moving = quiet < freeze_sweeps
+        if not moving.all():
+            active = active[moving]
+            quiet = quiet[moving]
+            kept_edges = moving[edge_rows]
+            edge_sources = edge_sources[kept_edges]
+            edge_rows = np.cumsum(moving)[edge_rows[kept_edges]] - 1
+    return rank / rank.sum()
+
+
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "extrapolation": extrapolated_power_iteration,
+    "adaptive": adaptive_power_iteration,
+}
+
+
+def solve_pagerank(corpus, damping_factor, solver="power", tolerance=TOLERANCE,
+                   max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page using one of the SOLVERS, together
+    with its telemetry: a dictionary holding the L1 residual and the seconds
+    taken by every iteration, under "residuals" and "seconds".
+
+    The corpus is compiled into a LinkGraph and is neither copied per
+    iteration nor modified.
+    """
+    graph = as_graph(corpus)
+    history = new_history()
+    rank = SOLVERS[solver](graph, damping_factor, tolerance, max_iterations, history)
+    return graph.to_ranks(rank), history
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page like `iterate_pagerank`, but by
+    compiling the corpus into integer-indexed CSR arrays once and running
+    vectorized sparse power iteration over them.
+
+    `corpus` may be a `crawl()` dictionary or a LinkGraph. The corpus is not modified.
+    """
+    graph = as_graph(corpus)
+    return graph.to_ranks(power_iteration(graph, damping_factor, tolerance))
+
+
+def seed_weights(seed):
+    """
+    Return a seed (a set of pages or a page -> weight dictionary) as a
+    dictionary of teleport weights. Raise ValueError unless the weights are
+    finite and non-negative with a positive sum.
+    """
+    weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+    total = sum(weights.values())
+    if not all(np.isfinite(weight) and weight >= 0 for weight in weights.values()) or not 0 < total < np.inf:
+        raise ValueError("seed weights must be finite and non-negative with a positive sum")
+    return weights
+
+
+def teleport_matrix(graph, seeds):
+    """
+    Return an N x K matrix whose columns are teleport distributions, one per
+    entry of `seeds`. Each entry is a set of pages to teleport to uniformly
+    or a dictionary mapping pages to (unnormalized) teleport weights; an
+    empty seed or one whose weights do not sum to a positive number raises
+    ValueError.
+    """
+    matrix = np.zeros((graph.num_pages, len(seeds)))
+    for k, seed in enumerate(seeds):
+        weights = seed_weights(seed)
+        for page, weight in weights.items():
+            matrix[graph.index[page], k] += weight
+        matrix[:, k] /= sum(weights.values())
+    return matrix
+
+
+def segment_sum(values, ptr):
+    """
+    Return the sums of `values` (along its first axis) over the CSR segments
+    values[ptr[i]:ptr[i + 1]], treating empty segments as zero.
+    """
+    sums = np.zeros((len(ptr) - 1,) + values.shape[1:])
+    nonempty = np.flatnonzero(np.diff(ptr))
+    if len(nonempty):
+        sums[nonempty] = np.add.reduceat(values, ptr[nonempty], axis=0)
+    return sums
+
+
+def personalized_power_iteration(graph, damping_factor, teleport, tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS):
+    """
+    Return the N x K rank matrix solving personalized PageRank for every
+    column of the N x K `teleport` matrix at once. With probability
+    1 - damping_factor the surfer jumps according to its own column of
+    `teleport` instead of uniformly; pages without links still spread their
+    rank over every page.
+
+    Each sweep gathers the inbound CSR edges once for all K columns, and
+    stops once every column's L1 change is below `tolerance`.
+    """
+    num_pages = graph.num_pages
+    in_ptr, in_links, _ = graph.inbound
+    linked = ~graph.dangling
+    inverse_degree = np.zeros(num_pages)
+    inverse_degree[linked] = 1 / graph.out_degree[linked]
+
+    ranks = teleport.copy()
+    for _ in range(max_iterations):
+        share = ranks * inverse_degree[:, None]
+        new_ranks = damping_factor * segment_sum(share[in_links], in_ptr)
+        new_ranks += (1 - damping_factor) * teleport
+        new_ranks += damping_factor * ranks[graph.dangling].sum(axis=0) / num_pages
+        residual = np.abs(new_ranks - ranks).sum(axis=0).max(initial=0)
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return ranks
+
+
+def absorbed_pagerank(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return the solution y of y = (1 - d) / N + d * A y by power iteration:
+    PageRank where rank reaching a page without links is dropped instead of
+    spread over every page. `push_personalized_pagerank` uses it to put the
+    rank that forward push drops back where PageRank would spread it.
+    """
+    num_pages = graph.num_pages
+    _, in_links, in_targets = graph.inbound
+    linked = ~graph.dangling
+    inverse_degree = np.zeros(num_pages)
+    inverse_degree[linked] = 1 / graph.out_degree[linked]
+
+    rank = np.full(num_pages, (1 - damping_factor) / num_pages)
+    for _ in range(max_iterations):
+        inflow = np.bincount(in_targets, weights=(rank * inverse_degree)[in_links], minlength=num_pages)
+        new_rank = (1 - damping_factor) / num_pages + damping_factor * inflow
+        residual = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if residual < tolerance:
+            break
+    return rank
+
+
+def forward_push(graph, damping_factor, seed, epsilon=1e-7):
+    """
+    Return a page id -> score dictionary approximating the solution y of
+    y = (1 - d) * s + d * A y for one seed distribution s, touching only
+    pages near the seed.
+
+    Residual starts on the seed pages. A page is pushed while its residual
+    exceeds `epsilon` times its number of links: it keeps 1 - damping_factor
+    of the residual and passes the rest evenly along its links. Residual
+    reaching a page without links is dropped, so the scores sum to less
+    than 1; pages missing from the dictionary score below the
+    approximation error.
+    """
+    weights = seed_weights(seed)
+    total = sum(weights.values())
+    residual = {graph.index[page]: weight / total for page, weight in weights.items()}
+    out_ptr, out_links = graph.out_ptr, graph.out_links
+
+    scores = dict()
+    queue = deque(residual)
+    queued = set(queue)
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        amount = residual.pop(u, 0)
+        scores[u] = scores.get(u, 0) + (1 - damping_factor) * amount
+
+        start, end = int(out_ptr[u]), int(out_ptr[u + 1])
+        if start == end:
+            continue
+        share = damping_factor * amount / (end - start)
+        for v in out_links[start:end].tolist():
+            residual[v] = residual.get(v, 0) + share
+            if v not in queued and residual[v] > epsilon * max(graph.out_degree[v], 1):
+                queue.append(v)
+                queued.add(v)
+    return scores
+
+
+def push_personalized_pagerank(graph, damping_factor, seed, epsilon=1e-7, absorbed=None):
+    """
+    Approximate personalized PageRank for one seed by forward push, solving
+    the same problem as `personalized_power_iteration`.
+
+    Personalized PageRank is linear in its teleport distribution, and a page
+    without links teleports uniformly, so it equals the `forward_push`
+    scores for the seed plus some multiple of `absorbed`, the
+    `absorbed_pagerank` vector (computed here if not given). The multiple
+    is whatever brings the total rank to 1. The push only touches pages
+    near the seed; `absorbed` is shared by every seed on the same graph.
+
+    Return a dictionary of page -> rank.
+    """
+    if absorbed is None:
+        absorbed = absorbed_pagerank(graph, damping_factor)
+    scores = forward_push(graph, damping_factor, seed, epsilon)
+    rank = absorbed * ((1 - sum(scores.values())) / absorbed.sum())
+    pages = np.fromiter(scores, dtype=np.int64, count=len(scores))
+    rank[pages] += np.fromiter(scores.values(), dtype=float, count=len(scores))
+    return graph.to_ranks(rank)
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, tolerance=TOLERANCE, push=False,
+                          epsilon=1e-7):
+    """
+    Return one page -> PageRank dictionary per entry of `seeds`, where each
+    entry is a set of pages or a page -> weight dictionary to teleport to.
+
+    By default all seeds are solved together as one rank matrix by
+    `personalized_power_iteration`. With `push=True` each seed is instead
+    approximated by `push_personalized_pagerank`, sharing one
+    `absorbed_pagerank` vector between the seeds.
+    """
+    graph = as_graph(corpus)
+    if push:
+        absorbed = absorbed_pagerank(graph, damping_factor, tolerance)
+        return [push_personalized_pagerank(graph, damping_factor, seed, epsilon, absorbed)
+                for seed in seeds]
+    ranks = personalized_power_iteration(graph, damping_factor, teleport_matrix(graph, seeds), tolerance)
+    return [graph.to_ranks(ranks[:, k]) for k in range(len(seeds))]
+
+
+class IncrementalPageRank():
+    """
+    PageRank that is kept up to date as pages are added, removed or changed.
+
+    Because teleporting and leaving a page without links both spread rank
+    uniformly, PageRank is proportional to the solution y of
+
+        y = (1 - d) + d * sum over pages i linking to p of y(i) / NumLinks(i)
+
+    where pages without links simply send nothing. Every term of this system
+    is local, so after a change the residual r = (1 - d) + d * A y - y is
+    only non-zero next to the pages that changed, and pushing residual along
+    links one page at a time only touches that region.
+
+    Changes are recorded on the graph with `LinkGraph.edit`, which keeps page
+    ids stable, and only merged into its CSR arrays once the pending edits
+    hold MERGE_FRACTION of the edges, so a small update costs time in
+    proportion to the change rather than to the graph.
+    """
+
+    def __init__(self, corpus, damping_factor, tolerance=1e-6, max_iterations=MAX_ITERATIONS):
+        self.graph = as_graph(corpus)
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+
+        # Solve the unnormalized system from scratch with vectorized sweeps
+        self.scores = np.full(self.graph.num_pages, 1 - damping_factor)
+        for _ in range(max_iterations):
+            residual = self._residual()
+            self.scores += residual
+            if np.abs(residual).max(initial=0) < tolerance:
+                break
+        self.residual = self._residual()
+
+    def _residual(self):
+        """Return (1 - d) + d * A y - y for the current scores, in one O(E) sweep."""
+        graph = self.graph
+        _, in_links, in_targets = graph.inbound
+        share = np.zeros(graph.num_pages)
+        linked = ~graph.dangling
+        share[linked] = self.scores[linked] / graph.out_degree[linked]
+        inflow = np.bincount(in_targets, weights=share[in_links], minlength=graph.num_pages)
+        return (1 - self.damping_factor) + self.damping_factor * inflow - self.scores
+
+    def _spread(self, pages, sign):
+        """
+        Add (sign = 1) or withdraw (sign = -1) the contribution each of `pages`
+        makes to the residual of the pages it links to.
+        Return the set of page ids whose residual changed.
+        """
+        touched = set()
+        for u in pages:
+            targets = self.graph.links(u)
+            if len(targets):
+                self.residual[targets] += sign * self.damping_factor * self.scores[u] / len(targets)
+                touched.update(targets.tolist())
+        return touched
+
+    def update(self, added=None, removed=(), modified=None):
+        """
+        Apply a change to the corpus and bring the ranks up to date.
+
+        `added` and `modified` map page names to the set of pages they link to,
+        and `removed` lists pages to delete. The change is recorded on the
+        graph in place, the previous scores are kept as a warm start, and
+        residual is pushed only through the pages around the change.
+
+        Return the number of pushes made.
+        """
+        graph = self.graph
+        links = {**(added or dict()), **(modified or dict())}
+        removed = [graph.index[page] for page in removed if page in graph.index]
+
+        # Pages whose outbound shares change: rewritten pages, removed pages,
+        # and pages that lose a link because its target is removed
+        affected = {graph.index[page] for page in links if page in graph.index}
+        affected.update(removed)
+        for i in removed:
+            affected.update(graph.linking(i))
+
+        withdrawn = self._spread(affected, -1)
+        num_pages = graph.num_pages
+        graph.edit(links, [graph.pages[i] for i in removed])
+
+        # New pages get ids at the end; removed pages keep theirs, emptied
+        new_pages = range(num_pages, graph.num_pages)
+        if len(new_pages):
+            self.scores = np.concatenate([self.scores, np.zeros(len(new_pages))])
+            self.residual = np.concatenate([self.residual, np.full(len(new_pages), 1 - self.damping_factor)])
+        self.scores[removed] = 0
+        self.residual[removed] = 0
+
+        touched = self._spread(affected.difference(removed), 1)
+        touched.update(withdrawn)
+        touched.update(new_pages)
+        pushes = self._push(touched)
+
+        if graph.pending_links() > MERGE_FRACTION * graph.num_edges:
+            self._merge()
+        return pushes
+
+    def _merge(self):
+        """Merge the graph's pending edits and carry scores and residuals over to the new page ids."""
+        remap = self.graph.merge()
+        kept = remap >= 0
+        scores = np.zeros(self.graph.num_pages)
+        residual = np.zeros(self.graph.num_pages)
+        scores[remap[kept]] = self.scores[kept]
+        residual[remap[kept]] = self.residual[kept]
+        self.scores, self.residual = scores, residual
+
+    def _push(self, pages):
+        """
+        Push residual from `pages`, and from any page it spills onto, until no
+        page's residual exceeds the tolerance. Pages are pushed in the order
+        their residual first exceeded it. Return the number of pushes.
+        """
+        links = self.graph.links
+        scores, residual = self.scores, self.residual
+        damping_factor, tolerance = self.damping_factor, self.tolerance
+
+        queue = deque(page for page in pages if abs(residual[page]) > tolerance)
+        queued = set(queue)
+        pushes = 0
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            amount = residual[u]
+            scores[u] += amount
+            residual[u] = 0
+            pushes += 1
+
+            targets = links(u)
+            if not len(targets):
+                continue
+            share = damping_factor * amount / len(targets)
+            for v in targets.tolist():
+                residual[v] += share
+                if v not in queued and abs(residual[v]) > tolerance:
+                    queue.append(v)
+                    queued.add(v)
+        return pushes
+
+    def vector(self):
+        """Return the current PageRank vector indexed by page id; removed pages not yet merged away have rank 0."""
+        return self.scores / self.scores.sum()
+
+    def ranks(self):
+        """Return the current page -> PageRank dictionary."""
+        return self.graph.to_ranks(self.vector())
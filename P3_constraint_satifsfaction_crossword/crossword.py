@@ -35,6 +35,76 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Vocabulary():
+    """
+    Index of a word list by length, letter position and letter.
+
+    Words of each length are numbered 0, 1, 2, ... in sorted order, and a
+    set of words of one length is a bitset: an int whose bit k is set if
+    word k is in the set. For every length, position and letter, the index
+    holds the bitset of words with that letter at that position, so
+    questions such as "which of these words could cross one of those" are
+    a few ANDs and ORs instead of comparisons between words.
+    """
+
+    def __init__(self, words):
+        self.words = dict()     # length -> sorted list of words
+        self.ids = dict()       # word -> number among words of its length
+        self.letters = dict()   # length -> list over positions of {letter: bitset}
+        for word in sorted(words):
+            self.words.setdefault(len(word), []).append(word)
+        for length, group in self.words.items():
+            positions = [dict() for _ in range(length)]
+            for k, word in enumerate(group):
+                self.ids[word] = k
+                for position, letter in enumerate(word):
+                    positions[position].setdefault(letter, []).append(k)
+            self.letters[length] = [
+                {letter: self.bitset(ids, len(group)) for letter, ids in position.items()}
+                for position in positions
+            ]
+
+    @staticmethod
+    def bitset(ids, size):
+        """Return the bitset of `ids`, all below `size`, built in one pass."""
+        bits = bytearray((size + 7) // 8)
+        for k in ids:
+            bits[k >> 3] |= 1 << (k & 7)
+        return int.from_bytes(bits, "little")
+
+    def mask(self, length):
+        """Return the bitset of every word of `length` letters."""
+        return (1 << len(self.words.get(length, []))) - 1
+
+    def decode(self, length, mask):
+        """Return the words of `length` letters in bitset `mask`, in sorted order."""
+        group = self.words.get(length, [])
+        return [group[k] for k, bit in enumerate(bin(mask)[:1:-1]) if bit == "1"]
+
+    def encode(self, word):
+        """Return the bitset holding just `word`."""
+        return 1 << self.ids[word]
+
+    def with_letter(self, length, position, letter):
+        """Return the bitset of words of `length` letters with `letter` at `position`."""
+        if length not in self.letters:
+            return 0
+        return self.letters[length][position].get(letter, 0)
+
+    def support(self, length, position, mask):
+        """Return the letters found at `position` in the words of bitset `mask`."""
+        if not mask:
+            return []
+        return [letter for letter, bits in self.letters[length][position].items() if mask & bits]
+
+    def compatible(self, length, position, letters):
+        """Return the bitset of words of `length` letters with any of `letters` at `position`."""
+        mask = 0
+        for letter in letters:
+            mask |= self.with_letter(length, position, letter)
+        return mask
+
+
 class Crossword():
 
     def __init__(self, structure_file, words_file):
@@ -60,6 +130,7 @@ class Crossword():
         # Save vocabulary list
         with open(words_file) as f:
             self.words = set(f.read().upper().splitlines())
+        self.vocabulary = Vocabulary(self.words)
 
         # Determine variable set
         self.variables = set()
@@ -1,6 +1,8 @@
 import sys
+from collections import deque
 
 from crossword import *
+from search import Search
 
 
 class CrosswordCreator():
@@ -10,11 +12,22 @@ class CrosswordCreator():
         Create new CSP crossword generate.
         """
         self.crossword = crossword
+        self.vocabulary = crossword.vocabulary
+
+        # Each domain is a bitset over the vocabulary's words of the
+        # variable's length (see Vocabulary), so it starts with every word
+        # that could fit
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.vocabulary.mask(var.length)
             for var in self.crossword.variables
         }
 
+    def domain_words(self, var):
+        """
+        Return the words still in the domain of `var`.
+        """
+        return self.vocabulary.decode(var.length, self.domains[var])
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -87,11 +100,13 @@ class CrosswordCreator():
 
     def solve(self):
         """
-        Enforce node and arc consistency, and then solve the CSP.
+        Enforce node and arc consistency, and then solve the CSP, keeping
+        arc consistency after every assignment (see search.Search).
         """
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return None
+        return Search(self).solve()
 
     def enforce_node_consistency(self):
         """
@@ -99,7 +114,9 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        raise NotImplementedError
+        # Domains only ever hold words of the variable's length
+        for var in self.domains:
+            self.domains[var] &= self.vocabulary.mask(var.length)
 
     def revise(self, x, y):
         """
@@ -110,7 +127,18 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        raise NotImplementedError
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is None:
+            return False
+        i, j = overlap
+
+        # Keep the words of x whose ith letter is the jth letter of some word of y
+        letters = self.vocabulary.support(y.length, j, self.domains[y])
+        revised = self.domains[x] & self.vocabulary.compatible(x.length, i, letters)
+        if revised == self.domains[x]:
+            return False
+        self.domains[x] = revised
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -121,21 +149,54 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        raise NotImplementedError
+        if arcs is None:
+            arcs = [
+                (x, y)
+                for x in self.crossword.variables
+                for y in self.crossword.neighbors(x)
+            ]
+        queue = deque(arcs)
+        queued = set(arcs)
+        while queue:
+            x, y = queue.popleft()
+            queued.discard((x, y))
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    return False
+                for z in self.crossword.neighbors(x) - {y}:
+                    if (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
+
+        # A variable with no crossings is never revised, so check every domain
+        return all(self.domains.values())
 
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
         crossword variable); return False otherwise.
         """
-        raise NotImplementedError
+        return all(var in assignment for var in self.crossword.variables)
 
     def consistent(self, assignment):
         """
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
-        raise NotImplementedError
+        # Every word is distinct and fits its variable
+        if len(set(assignment.values())) != len(assignment):
+            return False
+        for var, word in assignment.items():
+            if len(word) != var.length:
+                return False
+
+            # Crossing words agree on the shared cell
+            for neighbor in self.crossword.neighbors(var):
+                if neighbor in assignment:
+                    i, j = self.crossword.overlaps[var, neighbor]
+                    if word[i] != assignment[neighbor][j]:
+                        return False
+        return True
 
     def order_domain_values(self, var, assignment):
         """
@@ -144,7 +205,21 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        raise NotImplementedError
+        neighbors = [
+            (neighbor, self.crossword.overlaps[var, neighbor])
+            for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
+
+        def ruled_out(word):
+            count = 0
+            for neighbor, (i, j) in neighbors:
+                domain = self.domains[neighbor]
+                kept = domain & self.vocabulary.with_letter(neighbor.length, j, word[i])
+                count += domain.bit_count() - kept.bit_count()
+            return count
+
+        return sorted(self.domain_words(var), key=ruled_out)
 
     def select_unassigned_variable(self, assignment):
         """
@@ -154,7 +229,13 @@ class CrosswordCreator():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        raise NotImplementedError
+        return min(
+            (var for var in self.crossword.variables if var not in assignment),
+            key=lambda var: (
+                self.domains[var].bit_count(),
+                -len(self.crossword.neighbors(var))
+            )
+        )
 
     def backtrack(self, assignment):
         """
@@ -165,7 +246,17 @@ class CrosswordCreator():
 
         If no assignment is possible, return None.
         """
-        raise NotImplementedError
+        if self.assignment_complete(assignment):
+            return assignment
+        var = self.select_unassigned_variable(assignment)
+        for word in self.order_domain_values(var, assignment):
+            assignment[var] = word
+            if self.consistent(assignment):
+                result = self.backtrack(assignment)
+                if result is not None:
+                    return result
+            del assignment[var]
+        return None
 
 
 def main():
@@ -0,0 +1,269 @@
+from collections import OrderedDict, deque
+
+# Most learned nogoods kept at once; the least recently used go first
+MAX_NOGOODS = 10000
+
+
+class Search():
+    """
+    Backtracking search that maintains arc consistency (MAC) after every
+    assignment.
+
+    Variables are numbered 0 .. n-1 and everything about them lives in
+    lists indexed by that number: length, crossings, domain bitset (see
+    Vocabulary) and assigned word number. Every domain change is recorded
+    on a trail as (variable, previous domain), so undoing an assignment
+    pops the trail back to where it was and restores the domains in time
+    proportional to the changes, with no copying of domains.
+
+    Search backjumps on conflict (CBJ). Each variable carries a reason
+    bitset of the assigned variables whose propagation narrowed its domain;
+    when a domain empties, its reason is the conflict set, and when every
+    word for a variable fails, the search jumps straight back to the
+    deepest variable in the union of those conflict sets instead of the
+    previous one. The assignment of the conflict set's variables is then
+    learned as a nogood, kept in a bounded LRU cache and checked by
+    `consistent` before every assignment.
+
+    For every variable, crossed position and letter, `letter_counts` gives
+    how many words in the current domain have that letter there, which is
+    how many words a candidate leaves each crossing variable, so ordering
+    by least constraining value needs no scan of the crossing domains.
+    Counts belong to a domain: a prune sets them aside on the trail with
+    the old domain and they are recounted for the new one only when next
+    asked for, since propagation prunes far more often than values are
+    ordered. Undo puts the old counts back with the old domain.
+    """
+
+    def __init__(self, creator):
+        self.creator = creator
+        self.vocabulary = creator.vocabulary
+        self.variables = sorted(creator.crossword.variables,
+                                key=lambda var: (var.i, var.j, var.direction))
+        number = {var: v for v, var in enumerate(self.variables)}
+        self.lengths = [var.length for var in self.variables]
+        self.domains = [creator.domains[var] for var in self.variables]
+        self.values = [None] * len(self.variables)
+
+        # crossings[v] lists (u, i, j): v's ith letter is u's jth letter
+        self.crossings = [[] for _ in self.variables]
+        for (x, y), overlap in creator.crossword.overlaps.items():
+            if overlap is not None:
+                self.crossings[number[x]].append((number[y], overlap[0], overlap[1]))
+
+        # counts[v][i][letter]: words in v's domain with `letter` at position
+        # i, for the positions counted since v's domain last changed
+        self.counts = [dict() for _ in self.variables]
+
+        # Words must be distinct: (length, word number) -> variable using it
+        self.used = dict()
+        self.reasons = [0] * len(self.variables)
+        self.failure = 0            # conflict set of the last failed assignment
+        self.trail = []
+
+        # Learned nogoods, each a frozenset of (variable, word) pairs that
+        # cannot all hold together, and an index from each pair to them
+        self.nogoods = OrderedDict()
+        self.watches = dict()
+        self.max_nogoods = MAX_NOGOODS
+        self.nodes = 0
+        self.backjumps = 0
+
+    def prune(self, v, domain, reason):
+        """
+        Narrow the domain of `v` to `domain` because of the assigned
+        variables in bitset `reason`, recording the old domain and reason on
+        the trail.
+        """
+        if domain != self.domains[v]:
+            self.trail.append((v, self.domains[v], self.reasons[v], self.counts[v]))
+            self.counts[v] = dict()
+            self.domains[v] = domain
+            self.reasons[v] |= reason
+
+    def undo(self, mark):
+        """Restore every domain changed since the trail was `mark` entries long."""
+        trail, domains, reasons, counts = self.trail, self.domains, self.reasons, self.counts
+        while len(trail) > mark:
+            v, domains[v], reasons[v], counts[v] = trail.pop()
+
+    def letter_counts(self, v, i):
+        """Return {letter: words in the domain of `v` with that letter at position `i`}."""
+        letters = self.counts[v].get(i)
+        if letters is None:
+            letters = {
+                letter: (self.domains[v] & bits).bit_count()
+                for letter, bits in self.vocabulary.letters[self.lengths[v]][i].items()
+            }
+            self.counts[v][i] = letters
+        return letters
+
+    def explain(self, v):
+        """Return the bitset of assigned variables that the current domain of `v` depends on."""
+        return self.reasons[v] | (1 << v if self.values[v] is not None else 0)
+
+    def revise(self, u, i, v, j):
+        """
+        Remove from the domain of `u` every word whose ith letter is not the
+        jth letter of some word still in the domain of `v`. Return True if
+        the domain changed.
+        """
+        letters = self.vocabulary.support(self.lengths[v], j, self.domains[v])
+        domain = self.domains[u] & self.vocabulary.compatible(self.lengths[u], i, letters)
+        if domain == self.domains[u]:
+            return False
+        self.prune(u, domain, self.explain(v))
+        return True
+
+    def propagate(self, changed):
+        """
+        Make every arc into the variables reachable from `changed` consistent
+        again, AC-3 style. Return False if some domain becomes empty, with
+        the conflict set of the empty domain in `self.failure`.
+        """
+        queue, queued = deque(changed), set(changed)
+        while queue:
+            v = queue.popleft()
+            queued.discard(v)
+            for u, j, i in self.crossings[v]:
+                if self.revise(u, i, v, j):
+                    if not self.domains[u]:
+                        self.failure = self.explain(u)
+                        return False
+                    if u not in queued:
+                        queue.append(u)
+                        queued.add(u)
+        return True
+
+    def assign(self, v, word):
+        """
+        Assign word number `word` to `v` and restore arc consistency. Return
+        False if that empties a domain; the caller undoes the trail either way.
+        """
+        self.values[v] = word
+        self.used[self.lengths[v], word] = v
+        self.prune(v, 1 << word, 0)
+        return self.propagate([v])
+
+    def unassign(self, v):
+        """Take back the word assigned to `v`; its domain comes back through `undo`."""
+        del self.used[self.lengths[v], self.values[v]]
+        self.values[v] = None
+
+    def consistent(self, v, word):
+        """
+        Return True if word number `word` is not already used elsewhere and
+        assigning it to `v` completes no learned nogood. Otherwise return
+        False, with the variables responsible as the conflict set in
+        `self.failure`.
+
+        Distinctness is checked here rather than propagated into the other
+        domains, so that using a word only ever conflicts with the one
+        variable holding it instead of every domain of the same length.
+        """
+        user = self.used.get((self.lengths[v], word))
+        if user is not None:
+            self.failure = 1 << user
+            return False
+        for nogood in self.watches.get((v, word), ()):
+            if all(self.values[u] == other for u, other in nogood if u != v):
+                self.nogoods.move_to_end(nogood)
+                self.failure = 0
+                for u, _ in nogood:
+                    self.failure |= 1 << u
+                return False
+        return True
+
+    def learn(self, conflict):
+        """Record the current words of the variables in bitset `conflict` as a nogood."""
+        nogood = frozenset(
+            (u, self.values[u]) for u in range(len(self.variables)) if conflict >> u & 1
+        )
+        if not nogood:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.watches.setdefault(pair, set()).add(nogood)
+        if len(self.nogoods) > self.max_nogoods:
+            oldest, _ = self.nogoods.popitem(last=False)
+            for pair in oldest:
+                self.watches[pair].discard(oldest)
+                if not self.watches[pair]:
+                    del self.watches[pair]
+
+    def select(self):
+        """Return the unassigned variable with the fewest words left, then the most crossings."""
+        return min(
+            (v for v in range(len(self.variables)) if self.values[v] is None),
+            key=lambda v: (self.domains[v].bit_count(), -len(self.crossings[v]))
+        )
+
+    def order(self, v):
+        """
+        Return the word numbers in the domain of `v`, least constraining on
+        its crossings first. A word with letter c where v's ith letter
+        crosses u's jth letter leaves u the counts[u][j][c] words with c
+        there, so ranking by the sum of those counts over the unassigned
+        crossings is ranking by how few words the word rules out.
+        """
+        words = self.vocabulary.words.get(self.lengths[v], [])
+        crossings = [(i, self.letter_counts(u, j)) for u, i, j in self.crossings[v]
+                     if self.values[u] is None]
+
+        def kept(word):
+            return sum(counts.get(words[word][i], 0) for i, counts in crossings)
+
+        ids = [k for k, bit in enumerate(bin(self.domains[v])[:1:-1]) if bit == "1"]
+        return sorted(ids, key=kept, reverse=True)
+
+    def search(self):
+        """
+        Extend the current assignment to a complete one. Return (True, 0) on
+        success, or (False, conflict) with the bitset of assigned variables
+        whose words together leave no solution.
+        """
+        if all(value is not None for value in self.values):
+            return True, 0
+        self.nodes += 1
+        v = self.select()
+        conflict = self.reasons[v]
+        for word in self.order(v):
+            if not self.consistent(v, word):
+                conflict |= self.failure
+                continue
+            mark = len(self.trail)
+            if self.assign(v, word):
+                solved, failure = self.search()
+                if solved:
+                    return True, 0
+            else:
+                failure = self.failure
+            self.undo(mark)
+            self.unassign(v)
+            if not failure >> v & 1:
+                # v played no part in the failure, so no other word for it can help
+                self.backjumps += 1
+                return False, failure
+            conflict |= failure
+        conflict &= ~(1 << v)
+        self.learn(conflict)
+        return False, conflict
+
+    def solve(self):
+        """
+        Return a complete assignment of Variables to words, or None if there
+        is none. The creator's domains are the starting point.
+        """
+        # propagate only empties domains it revises, and a slot with no
+        # crossings is never revised
+        if not all(self.domains) or not self.propagate(range(len(self.variables))):
+            return None
+        if not self.search()[0]:
+            return None
+        return {
+            var: self.vocabulary.words[var.length][self.values[v]]
+            for v, var in enumerate(self.variables)
+        }